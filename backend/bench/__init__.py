@@ -0,0 +1,3 @@
+"""
+Offline load-test harness: local OpenAI / Deezer stand-ins plus a load generator
+"""
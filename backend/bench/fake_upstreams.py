@@ -0,0 +1,205 @@
+"""
+Local stand-ins for the OpenAI chat completions API and Deezer search, so the
+backend can be load-tested without network access or API keys.
+
+Run from backend/:  uvicorn bench.fake_upstreams:app --port 8766
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8766/v1 and
+DEEZER_API_URL=http://127.0.0.1:8766.
+
+Latency is `base + uniform(0, jitter)` seconds; a fraction of calls fail with
+a 500 (or, for OpenAI, a 429 when FAKE_LLM_RATE_LIMIT_RATE is set).
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.4"))
+FAKE_LLM_JITTER = float(os.getenv("FAKE_LLM_JITTER", "0.2"))
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+FAKE_LLM_RATE_LIMIT_RATE = float(os.getenv("FAKE_LLM_RATE_LIMIT_RATE", "0"))
+# Seconds between streamed chunks, and characters per chunk
+FAKE_LLM_CHUNK_DELAY = float(os.getenv("FAKE_LLM_CHUNK_DELAY", "0.01"))
+FAKE_LLM_CHUNK_CHARS = int(os.getenv("FAKE_LLM_CHUNK_CHARS", "12"))
+FAKE_DEEZER_LATENCY = float(os.getenv("FAKE_DEEZER_LATENCY", "0.12"))
+FAKE_DEEZER_JITTER = float(os.getenv("FAKE_DEEZER_JITTER", "0.08"))
+FAKE_DEEZER_ERROR_RATE = float(os.getenv("FAKE_DEEZER_ERROR_RATE", "0"))
+FAKE_DEEZER_MISS_RATE = float(os.getenv("FAKE_DEEZER_MISS_RATE", "0.05"))
+FAKE_BASE_URL = os.getenv("FAKE_BASE_URL", "http://127.0.0.1:8766")
+
+ARTISTS = [
+    "Frank Ocean", "SZA", "Daft Punk", "Kaytranada", "Little Simz", "Khruangbin",
+    "Anderson .Paak", "Jorja Smith", "Tame Impala", "Burna Boy", "Solange", "J Dilla",
+]
+TITLES = [
+    "Night Drive", "Golden Hour", "Slow Burn", "Sunday Loop", "Low Tide", "Blue Static",
+    "Afterglow", "Paper Planes", "Velvet", "Warm Signal", "Outside", "Late Checkout",
+]
+
+app = FastAPI()
+
+stats = {"completions": 0, "searches": 0, "errors": 0, "started": time.time()}
+
+
+async def _delay(base: float, jitter: float):
+    await asyncio.sleep(base + random.uniform(0, jitter))  # simulated latency  # nosec B311
+
+
+def _fail(error_rate: float) -> bool:
+    return error_rate > 0 and random.random() < error_rate  # simulated failures  # nosec B311
+
+
+def _reply_for(prompt: str) -> dict:
+    """Deterministic per prompt, so repeated prompts resolve the same tracks"""
+    seed = int(hashlib.sha1(prompt.encode(), usedforsecurity=False).hexdigest()[:8], 16)
+    rng = random.Random(seed)  # fake replies, not secrets  # nosec B311
+    tracks = [
+        {"artist": rng.choice(ARTISTS), "title": rng.choice(TITLES)}
+        for _ in range(3)
+    ]
+    workflow = None
+    if rng.random() < 0.5:
+        workflow = {"type": "todo", "title": "Session plan",
+                    "items": ["Pick a tempo", "Sketch the hook", "Record a rough take"]}
+    return {
+        "message": f"Here's a set for that mood ({prompt[:40]}) - press play and let it ride.",
+        "tracks": tracks,
+        "lyrics": None,
+        "workflow": workflow,
+    }
+
+
+def _completion(content: str, usage: dict) -> dict:
+    return {
+        "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()),
+        "model": "bench",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                     "finish_reason": "stop"}],
+        "usage": usage,
+    }
+
+
+def _chunk(delta: dict, finish_reason=None, usage=None) -> str:
+    body = {
+        "id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": int(time.time()),
+        "model": "bench",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    if usage is not None:
+        body["usage"] = usage
+    return f"data: {json.dumps(body)}\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["completions"] += 1
+    if _fail(FAKE_LLM_RATE_LIMIT_RATE):
+        stats["errors"] += 1
+        return JSONResponse({"error": {"message": "rate limited", "type": "rate_limit"}},
+                            status_code=429)
+    if _fail(FAKE_LLM_ERROR_RATE):
+        stats["errors"] += 1
+        await _delay(FAKE_LLM_LATENCY, FAKE_LLM_JITTER)
+        return JSONResponse({"error": {"message": "upstream failure", "type": "server_error"}},
+                            status_code=500)
+
+    prompt = body["messages"][-1]["content"]
+    content = json.dumps(_reply_for(prompt))
+    prompt_chars = sum(len(m.get("content") or "") for m in body["messages"])
+    usage = {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(content) // 4,
+             "total_tokens": (prompt_chars + len(content)) // 4}
+
+    # Latency is time to first token; streaming then spreads the body out
+    await _delay(FAKE_LLM_LATENCY, FAKE_LLM_JITTER)
+    if not body.get("stream"):
+        return _completion(content, usage)
+
+    async def chunks():
+        yield _chunk({"role": "assistant", "content": ""})
+        for i in range(0, len(content), FAKE_LLM_CHUNK_CHARS):
+            yield _chunk({"content": content[i:i + FAKE_LLM_CHUNK_CHARS]})
+            await asyncio.sleep(FAKE_LLM_CHUNK_DELAY)
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+        yield _chunk({}, "stop", usage if include_usage else None)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(chunks(), media_type="text/event-stream")
+
+
+@app.get("/search")
+async def search(q: str = "", limit: int = 1):
+    stats["searches"] += 1
+    await _delay(FAKE_DEEZER_LATENCY, FAKE_DEEZER_JITTER)
+    if _fail(FAKE_DEEZER_ERROR_RATE):
+        stats["errors"] += 1
+        return JSONResponse({"error": {"type": "Exception", "message": "fake failure"}},
+                            status_code=500)
+    if _fail(FAKE_DEEZER_MISS_RATE):
+        return {"data": [], "total": 0}
+    track_id = int(hashlib.sha1(q.encode(), usedforsecurity=False).hexdigest()[:8], 16)
+    album_id = track_id % 100000
+    return {"data": [{
+        "id": track_id,
+        "title": q,
+        "preview": f"{FAKE_BASE_URL}/media/preview/{track_id}.mp3",
+        "artist": {"name": q.split(" ")[0]},
+        "album": {
+            "id": album_id,
+            "title": f"Album {album_id}",
+            "cover_medium": f"{FAKE_BASE_URL}/media/cover/{album_id}.jpg",
+        },
+    }][:limit], "total": 1}
+
+
+@app.get("/track/{track_id}")
+async def track(track_id: int):
+    await _delay(FAKE_DEEZER_LATENCY, FAKE_DEEZER_JITTER)
+    return {"id": track_id, "preview": f"{FAKE_BASE_URL}/media/preview/{track_id}.mp3"}
+
+
+@app.get("/media/preview/{name}")
+async def preview_audio(name: str, request: Request):
+    # ~30 s of 128 kbit/s "audio", deterministic per track
+    body = hashlib.sha256(name.encode()).digest() * (480 * 1024 // 32)
+    await _delay(FAKE_DEEZER_LATENCY, FAKE_DEEZER_JITTER)
+    # Single `bytes=start-end` ranges, like the CDN serves
+    unit, _, spec = request.headers.get("range", "").partition("=")
+    if unit == "bytes" and "-" in spec:
+        first, _, last = spec.partition("-")
+        start = int(first or 0)
+        end = min(int(last) if last else len(body) - 1, len(body) - 1)
+        if start >= len(body):
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{len(body)}"})
+        return Response(body[start:end + 1], status_code=206, media_type="audio/mpeg", headers={
+            "Content-Range": f"bytes {start}-{end}/{len(body)}", "Accept-Ranges": "bytes",
+        })
+    return Response(body, media_type="audio/mpeg", headers={"Accept-Ranges": "bytes"})
+
+
+@app.get("/album/{album_id}")
+async def album(album_id: int):
+    await _delay(FAKE_DEEZER_LATENCY, FAKE_DEEZER_JITTER)
+    return {
+        "id": album_id,
+        "cover_small": f"{FAKE_BASE_URL}/media/cover/{album_id}.jpg?px=56",
+        "cover_medium": f"{FAKE_BASE_URL}/media/cover/{album_id}.jpg?px=250",
+    }
+
+
+@app.get("/media/cover/{name}")
+async def cover_image(name: str, px: int = 250):
+    # Placeholder bytes sized like a JPEG of that many pixels
+    body = hashlib.sha256(name.encode()).digest() * max(1, px * px // 160)
+    await _delay(FAKE_DEEZER_LATENCY, FAKE_DEEZER_JITTER)
+    return Response(body, media_type="image/jpeg")
+
+
+@app.get("/stats")
+async def get_stats():
+    return {**stats, "uptime": time.time() - stats["started"]}
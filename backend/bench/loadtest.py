@@ -0,0 +1,413 @@
+"""
+Offline load test for radio_boy_app
+
+Boots the fake upstreams and the app as separate uvicorn processes on free
+local ports, drives `/chat`, `/chat/stream`, `/collect-email` and `/` with a
+fixed number of concurrent virtual users, and writes latency percentiles,
+throughput and the app's RSS to a JSON file that can be compared between
+commits. Run from backend/:
+
+    python -m bench.loadtest --duration 30 --concurrency 50 --output bench.json
+    python -m bench.loadtest --compare bench.json     # rerun and diff against it
+
+Upstream latency / errors are set with the FAKE_* variables documented in
+bench/fake_upstreams.py; everything else in the environment (cache sizes,
+LLM_MAX_CONCURRENCY, ...) is passed through to the app unchanged. The app's
+databases and disk caches go to fresh paths under --log-dir unless set.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess  # starts the local app and fake servers  # nosec B404
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# endpoint -> relative weight in the default mix
+DEFAULT_MIX = "chat=6,chat_stream=2,collect_email=1,home=1"
+
+# Prefix of the reply /chat sends instead of a 5xx when the pipeline fails
+FAILURE_MESSAGE = "Sorry, I hit a snag"
+
+MOODS = [
+    "late night drive", "rainy sunday morning", "gym warm up", "writing a hook",
+    "cooking dinner with friends", "focus while coding", "sunset on the beach",
+    "heartbreak recovery", "summer block party", "studying for finals",
+    "road trip through the desert", "slow dance in the kitchen",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_bytes(pid: int) -> Optional[int]:
+    """Resident set size from /proc (Linux); None elsewhere"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def percentile(sorted_values: list, pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint in --mix: {name!r} (choose from {', '.join(ENDPOINTS)})")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class Server:
+    """A uvicorn subprocess, stopped on exit"""
+
+    def __init__(self, app: str, port: int, env: dict, log_path: Path):
+        self.app = app
+        self.port = port
+        self.env = env
+        self.log_path = log_path
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        self.log = open(self.log_path, "w")
+        self.process = subprocess.Popen(  # fixed argv, this interpreter  # nosec B603
+            [sys.executable, "-m", "uvicorn", self.app, "--host", "127.0.0.1",
+             "--port", str(self.port), "--log-level", "warning", "--no-access-log"],
+            cwd=BACKEND_DIR, env=self.env, stdout=self.log, stderr=subprocess.STDOUT,
+        )
+
+    async def wait_ready(self, path: str, timeout: float = 20):
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient() as client:
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    raise SystemExit(f"{self.app} exited during startup, see {self.log_path}")
+                try:
+                    await client.get(self.url + path, timeout=1)
+                    return
+                except httpx.HTTPError:
+                    await asyncio.sleep(0.1)
+        raise SystemExit(f"{self.app} did not start within {timeout}s, see {self.log_path}")
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        if self.process:
+            self.log.close()
+
+
+# ---------- Endpoint drivers; each returns the HTTP status ----------
+
+async def _chat_body(client: httpx.AsyncClient, rng: random.Random, prompt_pool: int) -> dict:
+    mood = MOODS[rng.randrange(len(MOODS))]
+    # A fresh server-issued session per chat, as the page starts one per conversation
+    session = await client.post("/session")
+    return {
+        "message": f"music for {mood} #{rng.randrange(prompt_pool)}",
+        "session_id": session.json()["session_id"],
+    }
+
+
+async def hit_chat(client: httpx.AsyncClient, rng: random.Random, opts) -> int:
+    response = await client.post("/chat", json=await _chat_body(client, rng, opts.prompt_pool))
+    # The handler answers 200 with an apology when the pipeline fails
+    if response.status_code == 200 and response.json().get("message", "").startswith(FAILURE_MESSAGE):
+        return 599
+    return response.status_code
+
+
+async def hit_chat_stream(client: httpx.AsyncClient, rng: random.Random, opts) -> int:
+    body = await _chat_body(client, rng, opts.prompt_pool)
+    async with client.stream("POST", "/chat/stream", json=body) as response:
+        status = response.status_code
+        async for line in response.aiter_lines():
+            if line == "event: error":
+                status = 599
+    return status
+
+
+async def hit_collect_email(client: httpx.AsyncClient, rng: random.Random, opts) -> int:
+    # A share of signups repeat an earlier address to exercise dedupe
+    n = rng.randrange(opts.email_pool)
+    response = await client.post("/collect-email", json={"email": f"listener{n}@bench.test"})
+    return response.status_code
+
+
+async def hit_home(client: httpx.AsyncClient, rng: random.Random, opts) -> int:
+    response = await client.get("/", headers={"Accept-Encoding": "gzip, br"})
+    return response.status_code
+
+
+ENDPOINTS = {
+    "chat": hit_chat,
+    "chat_stream": hit_chat_stream,
+    "collect_email": hit_collect_email,
+    "home": hit_home,
+}
+
+
+# ---------- Load generation ----------
+
+async def virtual_user(client, opts, mix, deadline, samples, worker_id):
+    rng = random.Random(opts.seed * 1000 + worker_id)  # reproducible request mix  # nosec B311
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    while time.monotonic() < deadline:
+        if opts.requests and sum(len(s) for s in samples.values()) >= opts.requests:
+            return
+        name = rng.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            status = await ENDPOINTS[name](client, rng, opts)
+        except httpx.HTTPError:
+            status = 0
+        samples[name].append((time.perf_counter() - started, status))
+        if opts.think_time:
+            await asyncio.sleep(rng.uniform(0, opts.think_time))
+
+
+async def sample_rss(pid: int, stop: asyncio.Event, readings: list):
+    while not stop.is_set():
+        value = rss_bytes(pid)
+        if value is not None:
+            readings.append(value)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=0.5)
+        except asyncio.TimeoutError:
+            pass
+
+
+def summarize(samples: list, elapsed: float) -> dict:
+    latencies = sorted(latency for latency, _ in samples)
+    errors = sum(1 for _, status in samples if not 200 <= status < 400)
+    ms = lambda value: None if value is None else round(value * 1000, 2)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+        "mean_ms": ms(sum(latencies) / len(latencies) if latencies else None),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(  # fixed git command for the report  # nosec B603 B607
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# App settings pointed at the log dir unless set in the environment
+BENCH_DATA_PATHS = {
+    "TRACK_CATALOG_PATH": "track_catalog.db",
+    "EMAIL_STORE_PATH": "emails.db",
+    "STATE_PATH": "state.db",
+    "PREVIEW_CACHE_DIR": "previews",
+    "COVER_CACHE_DIR": "covers",
+}
+
+
+def reset_path(path: Path):
+    """Remove a database (with its WAL files) or cache directory from an earlier run"""
+    if path.is_dir():
+        shutil.rmtree(path)
+        return
+    for suffix in ("", "-wal", "-shm"):
+        Path(str(path) + suffix).unlink(missing_ok=True)
+
+
+async def run(opts) -> dict:
+    mix = parse_mix(opts.mix)
+    log_dir = Path(opts.log_dir)
+    log_dir.mkdir(parents=True, exist_ok=True)
+
+    fake_port = opts.fake_port or free_port()
+    app_port = opts.app_port or free_port()
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    fake = Server("bench.fake_upstreams:app", fake_port,
+                  {**os.environ, "FAKE_BASE_URL": fake_url}, log_dir / "fake_upstreams.log")
+    app_env = {
+        **os.environ,
+        "OPENAI_API_KEY": "sk-bench",
+        "OPENAI_BASE_URL": f"{fake_url}/v1",
+        "DEEZER_API_URL": fake_url,
+    }
+    # Fresh, throwaway stores under the log dir, so runs don't warm each other
+    # and fake signups never reach the real email database
+    for name, default in BENCH_DATA_PATHS.items():
+        app_env[name] = os.environ.get(name, str(log_dir / default))
+        if name not in os.environ:
+            reset_path(log_dir / default)
+    app = Server("radio_boy_app:app", app_port, app_env, log_dir / "app.log")
+
+    fake.start()
+    app.start()
+    try:
+        await fake.wait_ready("/stats")
+        await app.wait_ready("/stats")
+        rss_start = rss_bytes(app.process.pid)
+
+        limits = httpx.Limits(max_connections=opts.concurrency, max_keepalive_connections=opts.concurrency)
+        timeout = httpx.Timeout(opts.timeout)
+        async with httpx.AsyncClient(base_url=app.url, limits=limits, timeout=timeout) as client:
+            if opts.warmup:
+                warm = {name: [] for name in mix}
+                await asyncio.gather(*(
+                    virtual_user(client, opts, mix, time.monotonic() + opts.warmup, warm, -1 - i)
+                    for i in range(opts.concurrency)
+                ))
+
+            samples = {name: [] for name in mix}
+            stop = asyncio.Event()
+            rss_readings = []
+            sampler = asyncio.create_task(sample_rss(app.process.pid, stop, rss_readings))
+            started = time.perf_counter()
+            deadline = time.monotonic() + opts.duration
+            await asyncio.gather(*(
+                virtual_user(client, opts, mix, deadline, samples, i)
+                for i in range(opts.concurrency)
+            ))
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await sampler
+
+            app_stats = (await client.get("/stats")).json()
+    finally:
+        app.stop()
+        fake.stop()
+
+    every = [sample for rows in samples.values() for sample in rows]
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "duration_s": round(elapsed, 2),
+            "concurrency": opts.concurrency,
+            "mix": mix,
+            "prompt_pool": opts.prompt_pool,
+            "email_pool": opts.email_pool,
+            "upstream": {k: v for k, v in os.environ.items() if k.startswith("FAKE_")},
+        },
+        "total": summarize(every, elapsed),
+        "endpoints": {name: summarize(rows, elapsed) for name, rows in samples.items()},
+        "rss": {
+            "start_bytes": rss_start,
+            "peak_bytes": max(rss_readings) if rss_readings else None,
+            "end_bytes": rss_readings[-1] if rss_readings else None,
+        },
+        "app_stats": app_stats,
+    }
+
+
+# ---------- Reporting ----------
+
+def print_report(result: dict, baseline: Optional[dict] = None):
+    meta = result["meta"]
+    print(f"\n{meta['duration_s']}s at concurrency {meta['concurrency']} (commit {meta['commit']})")
+    header = f"{'endpoint':<14}{'reqs':>8}{'err%':>7}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}"
+    print(header)
+    print("-" * len(header))
+    rows = list(result["endpoints"].items()) + [("total", result["total"])]
+    for name, row in rows:
+        print(f"{name:<14}{row['requests']:>8}{row['error_rate'] * 100:>6.1f}%{row['rps']:>9.1f}"
+              f"{_fmt(row['p50_ms']):>9}{_fmt(row['p95_ms']):>9}{_fmt(row['p99_ms']):>9}")
+        if baseline:
+            before = baseline["total"] if name == "total" else baseline["endpoints"].get(name)
+            if before:
+                print(f"{'  vs base':<14}{'':>8}{'':>7}{_delta(row['rps'], before['rps']):>9}"
+                      f"{_delta(row['p50_ms'], before['p50_ms']):>9}"
+                      f"{_delta(row['p95_ms'], before['p95_ms']):>9}"
+                      f"{_delta(row['p99_ms'], before['p99_ms']):>9}")
+    rss = result["rss"]
+    if rss["peak_bytes"]:
+        print(f"RSS: start {rss['start_bytes'] / 2**20:.1f} MiB, "
+              f"peak {rss['peak_bytes'] / 2**20:.1f} MiB, end {rss['end_bytes'] / 2**20:.1f} MiB")
+
+
+def _fmt(ms: Optional[float]) -> str:
+    return "-" if ms is None else f"{ms:.0f}ms"
+
+
+def _delta(now: Optional[float], before: Optional[float]) -> str:
+    if not now or not before:
+        return "-"
+    return f"{(now - before) / before * 100:+.0f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for radio_boy_app")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=3, help="Unmeasured seconds before measuring")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests (0 = no cap)")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Endpoint weights (default {DEFAULT_MIX})")
+    parser.add_argument("--prompt-pool", type=int, default=200,
+                        help="Distinct chat prompts per mood; smaller means more reply-cache hits")
+    parser.add_argument("--email-pool", type=int, default=5000, help="Distinct signup addresses")
+    parser.add_argument("--think-time", type=float, default=0, help="Max random pause between requests")
+    parser.add_argument("--timeout", type=float, default=60, help="Client timeout per request")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--fake-port", type=int, default=0)
+    parser.add_argument("--app-port", type=int, default=0)
+    parser.add_argument("--log-dir", default=str(BACKEND_DIR / "bench" / "results"),
+                        help="Where server logs (and the throwaway catalog) go")
+    parser.add_argument("--output", help="Write the JSON result here")
+    parser.add_argument("--compare", help="Baseline JSON result to diff against")
+    opts = parser.parse_args()
+
+    baseline = None
+    if opts.compare:
+        with open(opts.compare) as f:
+            baseline = json.load(f)
+
+    result = asyncio.run(run(opts))
+    print_report(result, baseline)
+    if opts.output:
+        with open(opts.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved {opts.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from openai import OpenAI
 
@@ -10,6 +13,164 @@ client = OpenAI()
 
 # Using gpt-4o for high-quality music takes
 MODEL_NAME = "gpt-4o"
+# Cheaper model that folds old turns into a running summary
+SUMMARY_MODEL = "gpt-4o-mini"
+
+# History window: the newest messages are resent verbatim, older ones are
+# summarized in the background, and no request goes over the token ceiling
+MAX_RECENT_MESSAGES = int(os.getenv("FRIEND_MAX_RECENT_MESSAGES", "12"))
+TOKEN_CEILING = int(os.getenv("FRIEND_TOKEN_CEILING", "6000"))
+# Print replies token by token (set FRIEND_STREAM=0 to wait for the full reply)
+STREAM_REPLIES = os.getenv("FRIEND_STREAM", "1") == "1"
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _encoding = None
+
+
+def count_tokens(messages):
+    """Local estimate of prompt tokens (tiktoken if installed, else ~4 chars/token)"""
+    total = 0
+    for message in messages:
+        text = message["content"]
+        total += 4 + (len(_encoding.encode(text)) if _encoding else len(text) // 4 + 1)
+    return total
+
+
+class HistoryManager:
+    """
+    Sliding-window chat history with a rolling summary of evicted turns.
+    Summaries run on a background thread between turns, so the next reply
+    never waits for one.
+    """
+
+    def __init__(self, system_message):
+        self.system_message = system_message
+        self.summary = ""
+        self.recent = []
+        # Evicted messages not yet folded into the summary; still sent verbatim
+        self.unsummarized = []
+        self._lock = threading.Lock()
+        self._summarizer = ThreadPoolExecutor(max_workers=1)
+
+    def add(self, role, content):
+        self.recent.append({"role": role, "content": content})
+
+    def evict(self):
+        """Move messages past the window out and summarize them off the critical path"""
+        if len(self.recent) <= MAX_RECENT_MESSAGES:
+            return
+        evicted = self.recent[:-MAX_RECENT_MESSAGES]
+        self.recent = self.recent[-MAX_RECENT_MESSAGES:]
+        with self._lock:
+            self.unsummarized.extend(evicted)
+        self._summarizer.submit(self._summarize)
+
+    def _summarize(self):
+        # Everything still unsummarized, including batches whose summary failed
+        with self._lock:
+            batch = list(self.unsummarized)
+        if not batch:
+            return
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in batch)
+        try:
+            response = client.chat.completions.create(
+                model=SUMMARY_MODEL,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": (
+                            "Update the running summary of a music chat. Keep the user's "
+                            "tastes, moods, artists and songs already recommended. "
+                            "Max 150 words."
+                        ),
+                    },
+                    {
+                        "role": "user",
+                        "content": f"Summary so far:\n{self.summary or '(none)'}\n\nNew turns:\n{transcript}",
+                    },
+                ],
+                max_tokens=300,
+            )
+            summary = response.choices[0].message.content.strip()
+        except Exception as e:
+            # Keep the turns verbatim; the token ceiling still bounds them
+            print(f"\n(summary skipped: {e})")
+            return
+        summarized = {id(m) for m in batch}
+        with self._lock:
+            self.summary = summary
+            self.unsummarized = [m for m in self.unsummarized if id(m) not in summarized]
+
+    def messages(self):
+        """Prompt for the next request, trimmed oldest-first to the token ceiling"""
+        with self._lock:
+            summary = self.summary
+            unsummarized = list(self.unsummarized)
+        head = [self.system_message]
+        if summary:
+            head.append({"role": "system", "content": f"Earlier in this chat: {summary}"})
+        body = unsummarized + self.recent
+        # Always keep the newest message (the user's current prompt)
+        while len(body) > 1 and count_tokens(head + body) > TOKEN_CEILING:
+            body.pop(0)
+        return head + body
+
+    def close(self):
+        self._summarizer.shutdown(wait=False, cancel_futures=True)
+
+def stream_reply(messages):
+    """
+    Print the reply as tokens arrive. Ctrl-C stops only this generation: the
+    upstream stream is closed so OpenAI stops producing (and billing) tokens.
+    Returns (reply_text, stats).
+    """
+    started = time.perf_counter()
+    first_token_at = None
+    parts = []
+    usage = None
+    aborted = False
+    stream = None
+    print("\nRadio Boy: ", end="", flush=True)
+    try:
+        stream = client.chat.completions.create(
+            model=MODEL_NAME,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                parts.append(chunk.choices[0].delta.content)
+                print(parts[-1], end="", flush=True)
+    except KeyboardInterrupt:
+        aborted = True
+        print(" [cut]", end="")
+    finally:
+        if stream is not None:
+            stream.close()
+    finished = time.perf_counter()
+    print("\n")
+
+    reply = "".join(parts)
+    completion_tokens = (
+        usage.completion_tokens if usage
+        else count_tokens([{"content": reply}]) - 4 if reply else 0
+    )
+    generating = finished - first_token_at if first_token_at else 0
+    return reply, {
+        "prompt_tokens": usage.prompt_tokens if usage else count_tokens(messages),
+        "ttft": first_token_at - started if first_token_at else None,
+        "tokens_per_sec": completion_tokens / generating if generating > 0 else None,
+        "aborted": aborted,
+    }
+
 
 def print_intro():
     print("✨" * 30)
@@ -18,6 +179,7 @@ def print_intro():
     print("  🔥  Drop a prompt about your fav artists or niche genres.")
     print("  💅  Talk your talk — we’re keeping it lowkey and casual.")
     print("  💀  Type 'exit', 'quit', or 'bye' when the session's over.")
+    print("  ✋  Ctrl-C while I'm talking cuts the reply, not the session.")
     print("=" * 60)
     print("              ✨ No gatekeeping here. ✨")
     print()
@@ -26,7 +188,7 @@ def main():
     print_intro()
 
     # Conversation setup: Radio Boy's Gen-Z Music Persona
-    messages = [
+    history = HistoryManager(
         {
             "role": "system",
             "content": (
@@ -39,7 +201,7 @@ def main():
                 "If the user asks for a playlist, give them 3-5 songs with a brief 'why it fits the vibe' explanation."
             ),
         }
-    ]
+    )
 
     while True:
         try:
@@ -56,26 +218,48 @@ def main():
             break
 
         # Add user message to history
-        messages.append({"role": "user", "content": user_input})
+        history.add("user", user_input)
+        messages = history.messages()
 
-        try:
-            # Call the Chat Completions API
-            response = client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=messages,
+        if STREAM_REPLIES:
+            try:
+                assistant_message, stats = stream_reply(messages)
+            except Exception as e:
+                print(f"Radio Boy (error): Yo, the signal dropped: {e}")
+                continue
+            ttft = f"{stats['ttft']:.2f}s" if stats["ttft"] is not None else "-"
+            tps = f"{stats['tokens_per_sec']:.1f}" if stats["tokens_per_sec"] else "-"
+            print(
+                f"  [prompt tokens: {stats['prompt_tokens']} | messages sent: {len(messages)}"
+                f" | first token: {ttft} | tokens/sec: {tps}]\n"
             )
-        except Exception as e:
-            print(f"Radio Boy (error): Yo, the signal dropped: {e}")
-            continue
+            if not assistant_message:
+                continue
+        else:
+            try:
+                # Call the Chat Completions API
+                response = client.chat.completions.create(
+                    model=MODEL_NAME,
+                    messages=messages,
+                )
+            except Exception as e:
+                print(f"Radio Boy (error): Yo, the signal dropped: {e}")
+                continue
+
+            # Extract assistant reply
+            assistant_message = response.choices[0].message.content
 
-        # Extract assistant reply
-        assistant_message = response.choices[0].message.content
+            # Print reply
+            print(f"\nRadio Boy: {assistant_message}\n")
+            prompt_tokens = response.usage.prompt_tokens if response.usage else count_tokens(messages)
+            print(f"  [prompt tokens: {prompt_tokens} | messages sent: {len(messages)}]\n")
 
-        # Print reply
-        print(f"\nRadio Boy: {assistant_message}\n")
+        # Add assistant reply back to history, then summarize anything that
+        # fell out of the window while the user types
+        history.add("assistant", assistant_message)
+        history.evict()
 
-        # Add assistant reply back to history
-        messages.append({"role": "assistant", "content": assistant_message})
+    history.close()
 
 if __name__ == "__main__":
     api_key = os.getenv("OPENAI_API_KEY")
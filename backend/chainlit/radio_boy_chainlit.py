@@ -1,23 +1,98 @@
+import html
+import os
+import sys
+from collections import deque
+from pathlib import Path
+
 import chainlit as cl
 
-# Your animation served from /public
-VIDEO_URL = "/public/animation.mp4"
+# Share the backend's modules (backend/radio_boy)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from radio_boy.llm import LLMClient
+from radio_boy.media import media_url
+from radio_boy.metrics import record_error
+from radio_boy.pipeline import reply_events, start_turn
+from radio_boy.sessions import new_session_id
+
+# Your animation: served by Chainlit from /public, or, when
+# RADIO_BOY_MEDIA_BASE points at the FastAPI app, from its hashed /media URL
+# (immutable caching and Range support, so it isn't refetched per message)
+RADIO_BOY_MEDIA_BASE = os.getenv("RADIO_BOY_MEDIA_BASE", "")
+VIDEO_URL = (
+    RADIO_BOY_MEDIA_BASE and media_url("animation.mp4", RADIO_BOY_MEDIA_BASE)
+) or "/public/animation.mp4"
+
+# Turns remembered per session (a ring buffer; the oldest fall off) and turns
+# drawn inside the card, so each card update stays the same size
+CARD_HISTORY_TURNS = int(os.getenv("CARD_HISTORY_TURNS", "50"))
+CARD_VISIBLE_TURNS = int(os.getenv("CARD_VISIBLE_TURNS", "6"))
+
+FAILURE_MESSAGE = "Sorry, I hit a snag. Try again!"
+
+# One client per process, shared by every chat session (see radio_boy/llm.py)
+_llm = None
+
+
+def get_llm() -> LLMClient:
+    global _llm
+    if _llm is None:
+        _llm = LLMClient()
+    return _llm
+
+
+def build_reply_html(reply):
+    """Track previews, lyrics and workflow blocks of the latest reply"""
+    if not reply:
+        return ""
+    parts = []
+    for track in reply.get("tracks") or []:
+        parts.append(f"""
+            <div style="display:flex;align-items:center;gap:10px;margin-top:12px;">
+                <img src="{html.escape(track.get("cover") or "")}" alt="" loading="lazy"
+                     style="width:48px;height:48px;border-radius:6px;object-fit:cover;">
+                <div style="flex:1;min-width:0;">
+                    <div style="font-size:14px;color:#fff;">{html.escape(track["title"])}</div>
+                    <div style="font-size:12px;color:#8e8e93;">{html.escape(track["artist"])}</div>
+                    <audio controls preload="none" src="{html.escape(track["preview"])}"
+                           style="width:100%;height:28px;margin-top:4px;"></audio>
+                </div>
+            </div>""")
+    lyrics = reply.get("lyrics")
+    if lyrics:
+        for label, key in (("Hook", "hook"), ("Verse", "verse"), ("Structure", "structure")):
+            if lyrics.get(key):
+                text = html.escape(lyrics[key]).replace("\n", "<br>")
+                parts.append(f'<div style="margin-top:12px;"><b>{label}</b><br>{text}</div>')
+        if lyrics.get("adlibs"):
+            parts.append(f'<div style="margin-top:8px;"><b>Ad-libs</b> {html.escape(", ".join(lyrics["adlibs"]))}</div>')
+    workflow = reply.get("workflow")
+    if workflow and workflow.get("items"):
+        items = "".join(f"<li>{html.escape(item)}</li>" for item in workflow["items"])
+        title = html.escape(workflow.get("title") or workflow.get("type") or "Workflow")
+        parts.append(f'<div style="margin-top:12px;"><b>{title}</b><ol style="margin:4px 0 0 18px;">{items}</ol></div>')
+    return "".join(parts)
 
 
-def build_card_html(history):
+def build_card_html(history, earlier=0, reply=None):
     """
     Build the Apple Music-style Radio Boy card as raw HTML.
-    `history` is a list of (speaker, text) tuples.
+    `history` is the (speaker, text) lines to show; `earlier` counts the
+    older lines that are paged out of the card; `reply` adds the latest
+    reply's tracks, lyrics and workflow under the conversation.
     """
     # Build the conversation text
     if not history:
         convo_text = "Type a vibe below and I'll riff back inside this card."
     else:
         lines = []
+        if earlier:
+            lines.append(f'<span style="color:#8e8e93;">{earlier} earlier messages</span>')
         for speaker, text in history:
             label = "You" if speaker == "user" else "Radio Boy"
-            lines.append(f"{label}: {text}")
+            lines.append(f"{label}: {html.escape(text) if text else '…'}")
         convo_text = "<br><br>".join(lines)
+    convo_text += build_reply_html(reply)
 
     card_html = f"""
     <div style="
@@ -62,12 +137,41 @@ def build_card_html(history):
     return card_html
 
 
+def new_history() -> deque:
+    return deque(maxlen=2 * CARD_HISTORY_TURNS)
+
+
+def render_card(history, total_lines: int, reply=None) -> str:
+    """Card HTML for the newest CARD_VISIBLE_TURNS turns"""
+    visible = list(history)[-2 * CARD_VISIBLE_TURNS:]
+    return build_card_html(visible, earlier=total_lines - len(visible), reply=reply)
+
+
+async def get_card() -> cl.Message:
+    """The session's one card message, sent on first use"""
+    card = cl.user_session.get("card")
+    if card is None:
+        card = cl.Message(content=render_card([], 0))
+        await card.send()
+        cl.user_session.set("card", card)
+    return card
+
+
+async def update_card(history, total_lines: int, reply=None):
+    """Redraw the card in place with the finished turn"""
+    card = await get_card()
+    card.content = render_card(history, total_lines, reply)
+    await card.update()
+
+
 @cl.on_chat_start
 async def start():
     """Runs once when the chat opens."""
-    cl.user_session.set("history", [])
-    html = build_card_html([])
-    await cl.Message(content=html).send()
+    cl.user_session.set("history", new_history())
+    cl.user_session.set("total_lines", 0)
+    cl.user_session.set("card", None)
+    cl.user_session.set("session_id", new_session_id())
+    await get_card()
 
 
 @cl.on_message
@@ -76,18 +180,47 @@ async def main(message: cl.Message):
     text = message.content.strip()
 
     # Get prior convo
-    history = cl.user_session.get("history", [])
+    history = cl.user_session.get("history") or new_history()
+    total_lines = cl.user_session.get("total_lines") or 0
 
     # Add user line
     history.append(("user", text))
+    total_lines += 1
+
+    # Same path as /chat/stream: shared caches, pooled clients, server-side
+    # session memory under an id issued when the chat opened
+    session, user_message, messages = start_turn(
+        {"message": text, "session_id": cl.user_session.get("session_id")}
+    )
+    reply = {"message": "", "tracks": [], "lyrics": None, "workflow": None}
+    # Only the reply text streams, as plain tokens into a temporary message;
+    # the card itself is redrawn once, when the turn is done
+    live = cl.Message(content="")
+
+    try:
+        async for event in reply_events(get_llm(), messages):
+            kind = event[0]
+            if kind == "token":
+                reply["message"] += event[1]
+                await live.stream_token(event[1])
+            elif kind == "done":
+                reply = event[1]
+                if session is not None:
+                    session.add_turn(user_message, reply)
+    except Exception as e:
+        record_error("chat", e)
+        print(f"Error: {e}")
+        reply = {"message": FAILURE_MESSAGE, "tracks": [], "lyrics": None, "workflow": None}
+    # The first token sent the live message; the card takes over from it
+    if live.content:
+        await live.remove()
 
-    # Simple Radio Boy reply for now
-    rb_reply = f"I hear a vibe like: {text} – want it smoother or more turn-up?"
-    history.append(("radio", rb_reply))
+    history.append(("radio", reply["message"]))
+    total_lines += 1
 
     # Save updated convo
     cl.user_session.set("history", history)
+    cl.user_session.set("total_lines", total_lines)
 
-    # Rebuild the card with full convo inside
-    card_html = build_card_html(history)
-    await cl.Message(content=card_html).send()
+    # Persist the finished card in place
+    await update_card(history, total_lines, reply)
@@ -0,0 +1,3 @@
+"""
+Radio Boy backend internals shared by the FastAPI app and the Chainlit UI
+"""
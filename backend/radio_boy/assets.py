@@ -0,0 +1,155 @@
+"""
+Precompressed, cacheable responses for the built-in page
+
+The page's CSS and JS live in backend/web/ and are served under
+content-hashed names with immutable caching; the HTML and each asset are
+compressed once (gzip, plus brotli when the `brotli` package is installed)
+and carry strong ETags so repeat visits revalidate with a 304. Dynamic JSON
+goes through the same Accept-Encoding negotiation, compressed per response.
+"""
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+WEB_DIR = Path(__file__).resolve().parent.parent / "web"
+# Responses smaller than this aren't worth compressing
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "512"))
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+CONTENT_TYPES = {
+    ".css": "text/css; charset=utf-8",
+    ".js": "text/javascript; charset=utf-8",
+    ".html": "text/html; charset=utf-8",
+}
+
+
+def _encoders() -> dict:
+    encoders = {"gzip": lambda body, best: gzip.compress(body, 9 if best else 5, mtime=0)}
+    if brotli is not None:
+        encoders["br"] = lambda body, best: brotli.compress(body, quality=11 if best else 4)
+    return encoders
+
+
+ENCODERS = _encoders()
+# Preferred first when the client weighs them equally
+PREFERENCE = ("br", "gzip")
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Best encoding we support from an Accept-Encoding header, or None for identity"""
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            weights[coding] = q
+    best, best_q = None, 0.0
+    for coding in PREFERENCE:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if coding in ENCODERS and q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def _etag_matches(if_none_match: str, etags: set) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag in etags:
+            return True
+    return False
+
+
+class Payload:
+    """A fixed body with every encoding computed up front"""
+
+    def __init__(self, body: bytes, content_type: str, cache_control: str = REVALIDATE):
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.digest = hashlib.sha256(body).hexdigest()
+        self.bodies = {None: body}
+        if len(body) >= COMPRESS_MIN_BYTES:
+            for coding, encode in ENCODERS.items():
+                compressed = encode(body, True)
+                if len(compressed) < len(body):
+                    self.bodies[coding] = compressed
+        # Strong ETags differ per encoding since the bytes differ
+        self.etags = {
+            coding: f'"{self.digest[:20]}-{coding}"' if coding else f'"{self.digest[:20]}"'
+            for coding in self.bodies
+        }
+
+    def response(self, request: Request) -> Response:
+        headers = {"Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+        coding = negotiate(request.headers.get("accept-encoding", ""))
+        if coding not in self.bodies:
+            coding = None
+        headers["ETag"] = self.etags[coding]
+        # Only this encoding's tag: a cached gzip body must not validate a br request
+        if _etag_matches(request.headers.get("if-none-match", ""), {self.etags[coding]}):
+            return Response(status_code=304, headers=headers)
+        if coding:
+            headers["Content-Encoding"] = coding
+        return Response(self.bodies[coding], media_type=self.content_type, headers=headers)
+
+    def stats(self) -> dict:
+        return {coding or "identity": len(body) for coding, body in self.bodies.items()}
+
+
+class AssetBundle:
+    """The files in web/, addressable by content-hashed name"""
+
+    def __init__(self, directory: Path = WEB_DIR, prefix: str = "/assets/"):
+        self.prefix = prefix
+        self.urls = {}
+        self.files = {}
+        for path in sorted(directory.iterdir()):
+            if path.suffix not in CONTENT_TYPES or path.suffix == ".html":
+                continue
+            payload = Payload(path.read_bytes(), CONTENT_TYPES[path.suffix], IMMUTABLE)
+            hashed = f"{path.stem}.{payload.digest[:12]}{path.suffix}"
+            self.urls[path.name] = prefix + hashed
+            self.files[hashed] = payload
+
+    def url(self, name: str) -> str:
+        return self.urls[name]
+
+    def get(self, hashed_name: str) -> Optional[Payload]:
+        return self.files.get(hashed_name)
+
+    def stats(self) -> dict:
+        return {name: payload.stats() for name, payload in self.files.items()}
+
+
+def json_response(request: Request, content, status_code: int = 200) -> Response:
+    """JSONResponse equivalent, compressed when the client accepts it and it's big enough"""
+    body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+    headers = {"Vary": "Accept-Encoding"}
+    coding = negotiate(request.headers.get("accept-encoding", "")) if len(body) >= COMPRESS_MIN_BYTES else None
+    if coding:
+        body = ENCODERS[coding](body, False)
+        headers["Content-Encoding"] = coding
+    return Response(body, status_code=status_code, media_type="application/json", headers=headers)
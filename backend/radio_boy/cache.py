@@ -0,0 +1,91 @@
+"""
+Small in-process TTL + LRU cache used in front of upstream APIs
+"""
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+# Returned by TTLCache.get() when there is no live entry, so a cached None
+# (e.g. a known Deezer miss) can be told apart from "not cached"
+MISSING = object()
+
+
+def approx_size(key: Hashable, value: Any) -> int:
+    """Rough byte footprint of an entry, good enough for a memory budget"""
+    return len(repr(key)) + len(json.dumps(value, default=str))
+
+
+class TTLCache:
+    """LRU cache with per-entry TTL, bounded by entry count and approximate bytes"""
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        # key -> (expires_at, size, value), oldest first
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, size, value = entry
+        if expires_at <= self._clock():
+            del self._data[key]
+            self.bytes -= size
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        size = approx_size(key, value)
+        if size > self.max_bytes:
+            return
+        self.pop(key)
+        self._data[key] = (self._clock() + (ttl or self.ttl), size, value)
+        self.bytes += size
+        while len(self._data) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, old_size, _) = self._data.popitem(last=False)
+            self.bytes -= old_size
+            self.evictions += 1
+
+    def pop(self, key: Hashable):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def clear(self):
+        self._data.clear()
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,285 @@
+"""
+Persistent SQLite catalog of resolved Deezer tracks
+
+Writes are queued by the request path and flushed in batches by a background
+task; all SQLite work runs on one dedicated thread so the event loop never
+touches the disk. Also usable as a CLI:
+
+    python -m radio_boy.catalog stats
+    python -m radio_boy.catalog export tracks.jsonl
+    python -m radio_boy.catalog import tracks.jsonl
+    python -m radio_boy.catalog prune --older-than-days 7
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from radio_boy.metrics import record_error
+
+DEFAULT_PATH = Path(__file__).resolve().parent.parent / "data" / "track_catalog.db"
+# Empty string disables the catalog
+TRACK_CATALOG_PATH = os.getenv("TRACK_CATALOG_PATH", str(DEFAULT_PATH))
+# Load the newest rows into the in-memory track cache at startup
+TRACK_CATALOG_WARM = os.getenv("TRACK_CATALOG_WARM", "1") == "1"
+TRACK_CATALOG_WARM_LIMIT = int(os.getenv("TRACK_CATALOG_WARM_LIMIT", "5000"))
+TRACK_CATALOG_BATCH = int(os.getenv("TRACK_CATALOG_BATCH", "50"))
+TRACK_CATALOG_FLUSH_INTERVAL = float(os.getenv("TRACK_CATALOG_FLUSH_INTERVAL", "2"))
+
+# No preview: Deezer's signed preview URLs expire long before a catalog row
+# does. Catalogs created before this still have the column; it is never read.
+TRACK_FIELDS = ("id", "title", "artist", "album", "cover", "album_id")
+COLUMNS = ", ".join(("key_artist", "key_title") + TRACK_FIELDS + ("fetched_at",))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    key_artist TEXT NOT NULL,
+    key_title  TEXT NOT NULL,
+    id         INTEGER NOT NULL,
+    title      TEXT NOT NULL,
+    artist     TEXT NOT NULL,
+    album      TEXT,
+    cover      TEXT,
+    album_id   INTEGER,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (key_artist, key_title)
+);
+CREATE INDEX IF NOT EXISTS tracks_fetched_at ON tracks (fetched_at);
+"""
+
+# Columns added after the first release: (name, type), applied on open
+MIGRATIONS = (("album_id", "INTEGER"),)
+
+# Statements are built only from the fixed TRACK_FIELDS tuple, never from input
+_PLACEHOLDERS = ", ".join("?" * (len(TRACK_FIELDS) + 3))
+_UPDATES = ", ".join(field + " = excluded." + field for field in TRACK_FIELDS)
+SELECT_COLUMNS = "SELECT " + COLUMNS + " FROM tracks"  # nosec B608
+LOOKUP = SELECT_COLUMNS + " WHERE key_artist = ? AND key_title = ?"
+NEWEST = SELECT_COLUMNS + " WHERE fetched_at >= ? ORDER BY fetched_at DESC LIMIT ?"
+INSERT = "INSERT INTO tracks (" + COLUMNS + ") VALUES (" + _PLACEHOLDERS + ")"  # nosec B608
+UPSERT = (
+    INSERT + " ON CONFLICT (key_artist, key_title) DO UPDATE SET " + _UPDATES  # nosec B608
+    + ", fetched_at = excluded.fetched_at"
+)
+
+
+def _row_to_entry(row: tuple) -> tuple:
+    """(key_artist, key_title, *fields, fetched_at) -> (key, track, fetched_at)"""
+    key = (row[0], row[1])
+    track = dict(zip(TRACK_FIELDS, row[2:-1]))
+    return key, track, row[-1]
+
+
+class TrackCatalog:
+    """SQLite (WAL) store of tracks keyed on the normalized (artist, title) pair"""
+
+    def __init__(self, path: str):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self._migrate()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog")
+        self._pending: list = []
+        self._wake: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self.writes = 0
+        self.lookups = 0
+        self.hits = 0
+
+    def _migrate(self):
+        existing = {row[1] for row in self.db.execute("PRAGMA table_info(tracks)")}
+        for name, type_ in MIGRATIONS:
+            if name not in existing:
+                self.db.execute(f"ALTER TABLE tracks ADD COLUMN {name} {type_}")
+        self.db.commit()
+
+    # -- synchronous API (catalog thread and CLI) --
+
+    def lookup(self, key: tuple, max_age: Optional[float] = None) -> Optional[tuple]:
+        row = self.db.execute(LOOKUP, key).fetchone()
+        if row is None:
+            return None
+        key, track, fetched_at = _row_to_entry(row)
+        if max_age is not None and time.time() - fetched_at > max_age:
+            return None
+        return track, fetched_at
+
+    def upsert_many(self, entries: list):
+        """entries: [(key, track, fetched_at), ...]"""
+        rows = [
+            (*key, *(track.get(field) for field in TRACK_FIELDS), fetched_at)
+            for key, track, fetched_at in entries
+        ]
+        with self.db:
+            self.db.executemany(UPSERT, rows)
+        self.writes += len(rows)
+
+    def newest(self, limit: int, max_age: Optional[float] = None) -> list:
+        """Newest entries first, as (key, track, fetched_at)"""
+        since = time.time() - max_age if max_age is not None else 0
+        rows = self.db.execute(NEWEST, (since, limit))
+        return [_row_to_entry(row) for row in rows]
+
+    def count(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+
+    def prune(self, older_than: float) -> int:
+        """Delete rows fetched more than `older_than` seconds ago"""
+        with self.db:
+            cursor = self.db.execute(
+                "DELETE FROM tracks WHERE fetched_at < ?", (time.time() - older_than,)
+            )
+        return cursor.rowcount
+
+    def export(self, out) -> int:
+        n = 0
+        for key, track, fetched_at in self.newest(limit=-1):
+            out.write(json.dumps({"key": key, "track": track, "fetched_at": fetched_at}) + "\n")
+            n += 1
+        return n
+
+    def import_(self, lines) -> int:
+        entries = []
+        for line in lines:
+            if line.strip():
+                item = json.loads(line)
+                entries.append((tuple(item["key"]), item["track"], item["fetched_at"]))
+        self.upsert_many(entries)
+        return len(entries)
+
+    # -- async API (request path) --
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def get(self, key: tuple, max_age: Optional[float] = None) -> Optional[tuple]:
+        """(track, fetched_at) if the catalog knows the track, else None"""
+        self.lookups += 1
+        found = await self._run(self.lookup, key, max_age)
+        if found is not None:
+            self.hits += 1
+        return found
+
+    async def recent(self, limit: int, max_age: Optional[float] = None) -> list:
+        return await self._run(self.newest, limit, max_age)
+
+    def add(self, key: tuple, track: dict):
+        """Queue a resolved track for the next batched write"""
+        self._pending.append((key, track, time.time()))
+        if len(self._pending) >= TRACK_CATALOG_BATCH and self._wake is not None:
+            self._wake.set()
+
+    async def flush(self):
+        if self._pending:
+            batch, self._pending = self._pending, []
+            try:
+                await self._run(self.upsert_many, batch)
+            except sqlite3.Error as e:
+                record_error("catalog", e)
+                print(f"Track catalog write error: {e}")
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), TRACK_CATALOG_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def start(self):
+        self._wake = asyncio.Event()
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        await self._run(self.db.close)
+        self._executor.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "writes": self.writes,
+            "pending": len(self._pending),
+        }
+
+
+_catalog: Optional[TrackCatalog] = None
+
+
+def get_catalog() -> Optional[TrackCatalog]:
+    """The running catalog, or None when disabled / outside the lifespan"""
+    return _catalog
+
+
+async def start_catalog(path: str = TRACK_CATALOG_PATH) -> Optional[TrackCatalog]:
+    global _catalog
+    if not path:
+        return None
+    _catalog = TrackCatalog(path)
+    _catalog.start()
+    return _catalog
+
+
+async def close_catalog():
+    global _catalog
+    if _catalog is not None:
+        await _catalog.close()
+        _catalog = None
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(prog="python -m radio_boy.catalog")
+    parser.add_argument("--db", default=TRACK_CATALOG_PATH or str(DEFAULT_PATH))
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats", help="print the number of stored tracks")
+    export = commands.add_parser("export", help="write all tracks as JSON lines")
+    export.add_argument("file", nargs="?", default="-")
+    import_ = commands.add_parser("import", help="load tracks from JSON lines")
+    import_.add_argument("file", nargs="?", default="-")
+    prune = commands.add_parser("prune", help="delete old tracks")
+    prune.add_argument("--older-than-days", type=float, required=True)
+    args = parser.parse_args(argv)
+
+    catalog = TrackCatalog(args.db)
+    if args.command == "stats":
+        print(f"{catalog.count()} tracks in {args.db}")
+    elif args.command == "export":
+        if args.file == "-":
+            n = catalog.export(sys.stdout)
+        else:
+            with open(args.file, "w") as out:
+                n = catalog.export(out)
+        print(f"Exported {n} tracks", file=sys.stderr)
+    elif args.command == "import":
+        if args.file == "-":
+            n = catalog.import_(sys.stdin)
+        else:
+            with open(args.file) as lines:
+                n = catalog.import_(lines)
+        print(f"Imported {n} tracks", file=sys.stderr)
+    elif args.command == "prune":
+        n = catalog.prune(args.older_than_days * 86400)
+        print(f"Pruned {n} tracks", file=sys.stderr)
+    catalog.db.close()
+
+
+if __name__ == "__main__":
+    main()
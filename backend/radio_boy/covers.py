@@ -0,0 +1,164 @@
+"""
+/cover/{album_id}: album art at the size the UI actually draws
+
+Track cards show covers at 44-48px but Deezer's `cover_medium` is 250px.
+Each (album, size) variant is built once: fetched from the smallest Deezer
+rendition that covers it, downscaled when Pillow is installed, and kept in a
+bounded disk cache. An album's rendition URLs are looked up once and shared
+by both sizes. Variant URLs never change content, so they are served with
+immutable caching. Without Pillow the nearest Deezer rendition is cached and
+served as is; a variant the cache can't take is served from memory.
+"""
+import io
+import os
+from pathlib import Path
+from typing import Optional
+
+import anyio
+from starlette.requests import Request
+from starlette.responses import Response
+
+from radio_boy.cache import MISSING
+from radio_boy.deezer import DEEZER_API_URL
+from radio_boy.disk_cache import DiskCache
+from radio_boy.http_pool import get_pool
+from radio_boy.media import IMMUTABLE, file_response
+from radio_boy.metrics import record_error
+from radio_boy.singleflight import SingleFlight
+from radio_boy.state import get_state
+
+try:
+    from PIL import Image
+except ImportError:  # optional: pip install Pillow
+    Image = None
+
+DEFAULT_DIR = Path(__file__).resolve().parent.parent / "data" / "covers"
+COVER_CACHE_DIR = os.getenv("COVER_CACHE_DIR", str(DEFAULT_DIR))
+COVER_CACHE_MAX_BYTES = int(os.getenv("COVER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+COVER_MAX_FILE_BYTES = 2 * 1024 * 1024
+# 48px for the cards, 96px for the same cards on 2x screens
+COVER_SIZES = (48, 96)
+COVER_JPEG_QUALITY = 82
+
+# Deezer renditions by pixel size, smallest first
+DEEZER_RENDITIONS = ((56, "cover_small"), (250, "cover_medium"), (500, "cover_big"), (1000, "cover_xl"))
+
+# Rendition URLs per album; they don't change. Unknown albums are rechecked
+# after ALBUM_MISS_TTL seconds
+ALBUM_MISS_TTL = 600
+album_cache = get_state().cache("albums", max_entries=20000, max_bytes=8 * 1024 * 1024, ttl=86400)
+album_flights = SingleFlight()
+cover_flights = SingleFlight()
+
+_cache: Optional[DiskCache] = None
+
+
+def get_cover_cache() -> DiskCache:
+    global _cache
+    if _cache is None:
+        _cache = DiskCache(Path(COVER_CACHE_DIR), COVER_CACHE_MAX_BYTES, COVER_MAX_FILE_BYTES)
+    return _cache
+
+
+async def _fetch_renditions(album_id: int) -> Optional[dict]:
+    response = await get_pool().get(f"{DEEZER_API_URL}/album/{album_id}")
+    if response.status_code == 404:
+        album = None
+    elif response.status_code != 200:
+        raise RuntimeError(f"Deezer album lookup: HTTP {response.status_code}")
+    else:
+        album = response.json()
+        if not isinstance(album, dict):
+            raise RuntimeError("Deezer album lookup: unexpected body")
+        error = album.get("error")
+        if error:
+            # Deezer answers "no such album" with code 800; anything else is an outage
+            if not isinstance(error, dict) or error.get("code") != 800:
+                raise RuntimeError(f"Deezer album lookup: {error}")
+            album = None
+    renditions = None
+    if album is not None:
+        renditions = {field: album[field] for _, field in DEEZER_RENDITIONS if album.get(field)}
+        if album.get("cover"):
+            renditions["cover"] = album["cover"]
+    album_cache.set(album_id, renditions, ttl=None if renditions else ALBUM_MISS_TTL)
+    return renditions
+
+
+async def album_renditions(album_id: int) -> Optional[dict]:
+    """Deezer's cover URLs for an album, fetched once for every size"""
+    cached = album_cache.get(album_id)
+    if cached is not MISSING:
+        return cached
+    return await album_flights.do(album_id, lambda: _fetch_renditions(album_id))
+
+
+async def cover_source(album_id: int, size: int) -> Optional[str]:
+    """URL of the smallest Deezer rendition at least `size` pixels wide"""
+    album = await album_renditions(album_id)
+    if not album:
+        return None
+    for pixels, field in DEEZER_RENDITIONS:
+        if pixels >= size and album.get(field):
+            return album[field]
+    return album.get("cover_xl") or album.get("cover") or None
+
+
+def resize(data: bytes, size: int) -> bytes:
+    """Downscale to `size` px JPEG; the original bytes if Pillow is missing or fails"""
+    if Image is None:
+        return data
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if max(image.size) <= size:
+                return data
+            image = image.convert("RGB")
+            image.thumbnail((size, size), Image.LANCZOS)
+            out = io.BytesIO()
+            image.save(out, "JPEG", quality=COVER_JPEG_QUALITY, optimize=True, progressive=True)
+            return out.getvalue()
+    except Exception as e:
+        print(f"Cover resize error: {e}")
+        return data
+
+
+async def _build_variant(album_id: int, size: int) -> Optional[tuple]:
+    """(cached path or None, image bytes), or None when the album has no cover"""
+    source = await cover_source(album_id, size)
+    if source is None:
+        return None
+    response = await get_pool().get(source, follow_redirects=True)
+    if response.status_code != 200:
+        raise RuntimeError(f"cover image: HTTP {response.status_code}")
+    data = await anyio.to_thread.run_sync(resize, response.content, size)
+    path = None
+    writer = get_cover_cache().writer(f"{album_id}-{size}.jpg")
+    if writer is not None:
+        await writer.write(data)
+        path = await writer.commit()
+    return path, data
+
+
+async def cover_response(request: Request, album_id: int, size: int) -> Response:
+    if size not in COVER_SIZES:
+        return Response(status_code=404)
+    name = f"{album_id}-{size}.jpg"
+    path = get_cover_cache().get(name)
+    if path is None:
+        try:
+            built = await cover_flights.do(name, lambda: _build_variant(album_id, size))
+        except Exception as e:
+            record_error("cover", e)
+            print(f"Cover fetch error for {album_id}: {e}")
+            return Response(status_code=502)
+        if built is None:
+            return Response(status_code=404)
+        path, data = built
+        if path is None:
+            # Not cached (over the size limit, or being written): send it anyway
+            return Response(data, media_type="image/jpeg", headers={"Cache-Control": "public, max-age=86400"})
+    stat = path.stat()
+    return file_response(
+        request, path, etag=f'"cover-{album_id}-{size}-{stat.st_size}"', media_type="image/jpeg",
+        cache_control=IMMUTABLE, size=stat.st_size, mtime=stat.st_mtime,
+    )
@@ -0,0 +1,318 @@
+"""
+Deezer track search used to attach 30-second previews to recommendations
+"""
+import asyncio
+import os
+import re
+import time
+import unicodedata
+from typing import Optional
+
+from radio_boy.cache import MISSING
+from radio_boy.catalog import TRACK_CATALOG_WARM_LIMIT, TrackCatalog, get_catalog
+from radio_boy.http_pool import get_pool
+from radio_boy.metrics import DEEZER_DURATION, record_error
+from radio_boy.singleflight import SingleFlight
+from radio_boy.state import get_state
+
+DEEZER_API_URL = os.getenv("DEEZER_API_URL", "https://api.deezer.com")
+# Most tracks we resolve per reply, matching what the UI shows
+MAX_TRACKS = 3
+# Max Deezer lookups in flight for a single reply
+DEEZER_FANOUT = int(os.getenv("DEEZER_FANOUT", "3"))
+# Seconds one lookup may take before the reply goes out without it
+DEEZER_LOOKUP_TIMEOUT = float(os.getenv("DEEZER_LOOKUP_TIMEOUT", "4"))
+
+# Track lookup cache: hits live for a day, misses ("no such track") for 10 min
+TRACK_CACHE_TTL = float(os.getenv("TRACK_CACHE_TTL", "86400"))
+TRACK_CACHE_MISS_TTL = float(os.getenv("TRACK_CACHE_MISS_TTL", "600"))
+TRACK_CACHE_MAX_ENTRIES = int(os.getenv("TRACK_CACHE_MAX_ENTRIES", "10000"))
+TRACK_CACHE_MAX_BYTES = int(os.getenv("TRACK_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Deezer signs preview URLs with an expiry, so they are cached apart from the
+# track and only briefly; the track caches never hold one
+PREVIEW_URL_TTL = float(os.getenv("PREVIEW_URL_TTL", "600"))
+
+# Point preview URLs at this app's /preview proxy (radio_boy/previews.py)
+PREVIEW_PROXY = os.getenv("PREVIEW_PROXY", "0") == "1"
+# Point cover art at /cover/{album_id} (radio_boy/covers.py), sized for the cards
+COVER_PROXY = os.getenv("COVER_PROXY", "0") == "1"
+COVER_PROXY_SIZE = int(os.getenv("COVER_PROXY_SIZE", "96"))
+# Public origin for proxied URLs; empty keeps them relative to the page
+PROXY_BASE_URL = os.getenv("PROXY_BASE_URL", "").rstrip("/")
+
+track_cache = get_state().cache(
+    "tracks",
+    max_entries=TRACK_CACHE_MAX_ENTRIES,
+    max_bytes=TRACK_CACHE_MAX_BYTES,
+    ttl=TRACK_CACHE_TTL,
+)
+# Deezer track id -> signed preview URL
+preview_urls = get_state().cache(
+    "preview_urls",
+    max_entries=TRACK_CACHE_MAX_ENTRIES,
+    max_bytes=TRACK_CACHE_MAX_BYTES,
+    ttl=PREVIEW_URL_TTL,
+)
+
+# Identical lookups that miss the cache at the same moment share one request
+deezer_flights = SingleFlight()
+
+# "Song (feat. X)", "Artist ft. X", "Song [featuring X]" -> drop the feature
+_FEATURE_RE = re.compile(
+    r"(?<=\S)\s*[(\[]?\s*\b(?:feat\.?|ft\.|featuring)\s.*$", re.IGNORECASE
+)
+_PUNCTUATION_RE = re.compile(r"[^\w\s]|_")
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _FEATURE_RE.sub("", text.casefold())
+    return " ".join(_PUNCTUATION_RE.sub(" ", text).split())
+
+
+def track_key(artist: str, title: str) -> tuple:
+    """Cache key that folds case, accents, punctuation and featured artists"""
+    return (_normalize(artist), _normalize(title))
+
+
+class DeezerError(Exception):
+    """Deezer answered with an error (HTTP status or an `error` body), not a result"""
+
+
+async def fetch_deezer(artist: str, title: str) -> Optional[dict]:
+    """Search Deezer for a track; None means Deezer has no match, errors raise"""
+    query = f"{artist} {title}"
+    started = time.perf_counter()
+    try:
+        response = await get_pool().get(
+            f"{DEEZER_API_URL}/search",
+            params={"q": query, "limit": 1}
+        )
+        if response.status_code != 200:
+            raise DeezerError(f"HTTP {response.status_code}")
+        data = response.json()
+        # Quota and other API errors come back as 200 with {"error": {...}}
+        if not isinstance(data, dict) or "error" in data or not isinstance(data.get("data"), list):
+            error = data.get("error") if isinstance(data, dict) else None
+            raise DeezerError(f"bad search response: {error or data!r}"[:200])
+    except Exception:
+        DEEZER_DURATION.labels("error").observe(time.perf_counter() - started)
+        raise
+    found = bool(data["data"])
+    DEEZER_DURATION.labels("hit" if found else "miss").observe(time.perf_counter() - started)
+    if found:
+        track = data["data"][0]
+        return {
+            "id": track["id"],
+            "title": track["title"],
+            "artist": track["artist"]["name"],
+            "album": track["album"]["title"],
+            "cover": track["album"]["cover_medium"],
+            "preview": track["preview"],  # 30-second preview URL
+            "album_id": track["album"].get("id"),
+        }
+    return None
+
+
+async def preview_source(track_id: int) -> Optional[str]:
+    """Current preview URL for a Deezer track id, or None"""
+    response = await get_pool().get(f"{DEEZER_API_URL}/track/{track_id}")
+    if response.status_code != 200:
+        return None
+    data = response.json()
+    if not isinstance(data, dict) or "error" in data:
+        return None
+    return data.get("preview") or None
+
+
+def _without_preview(track: Optional[dict]) -> Optional[dict]:
+    """The part of a track that stays valid for TRACK_CACHE_TTL"""
+    if not track or "preview" not in track:
+        return track
+    return {field: value for field, value in track.items() if field != "preview"}
+
+
+async def _lookup_uncached(key: tuple, artist: str, title: str) -> Optional[dict]:
+    """Catalog, then network; stores the answer in the cache layers"""
+    catalog = get_catalog()
+    if catalog is not None:
+        try:
+            found = await catalog.get(key, max_age=TRACK_CACHE_TTL)
+        except Exception as e:
+            print(f"Track catalog read error: {e}")
+            found = None
+        if found is not None:
+            track, fetched_at = found
+            track_cache.set(key, track, ttl=TRACK_CACHE_TTL - (time.time() - fetched_at))
+            return track
+
+    track = await fetch_deezer(artist, title)
+    if track and track.get("preview"):
+        preview_urls.set(track["id"], track["preview"])
+    track = _without_preview(track)
+    track_cache.set(key, track, ttl=None if track else TRACK_CACHE_MISS_TTL)
+    if track and catalog is not None:
+        catalog.add(key, track)
+    return track
+
+
+async def _fetch_preview_url(track_id: int) -> Optional[str]:
+    source = await preview_source(track_id)
+    if source is not None:
+        preview_urls.set(track_id, source)
+    return source
+
+
+async def preview_url(track_id: int) -> str:
+    """A preview URL that is still signed, falling back to the /preview proxy"""
+    cached = preview_urls.get(track_id)
+    if cached is not MISSING:
+        return cached
+    try:
+        source = await deezer_flights.do(
+            ("preview", track_id), lambda: _fetch_preview_url(track_id)
+        )
+    except Exception as e:
+        record_error("deezer", e)
+        print(f"Deezer preview lookup error: {e}")
+        source = None
+    return source or f"{PROXY_BASE_URL}/preview/{track_id}"
+
+
+async def public_track(track: Optional[dict]) -> Optional[dict]:
+    """A track as the UI gets it, with a preview URL that has not expired"""
+    if not track:
+        return track
+    track = dict(track)
+    if PREVIEW_PROXY:
+        track["preview"] = f"{PROXY_BASE_URL}/preview/{track['id']}"
+    else:
+        track["preview"] = await preview_url(track["id"])
+    # Tracks stored before album ids were recorded keep Deezer's cover URL
+    if COVER_PROXY and track.get("album_id"):
+        track["cover"] = f"{PROXY_BASE_URL}/cover/{track['album_id']}?size={COVER_PROXY_SIZE}"
+    return track
+
+
+async def lookup_track(artist: str, title: str) -> Optional[dict]:
+    """A track as the caches keep it (no preview URL), or None"""
+    key = track_key(artist, title)
+    cached = track_cache.get(key)
+    if cached is not MISSING:
+        return cached
+    try:
+        return await deezer_flights.do(key, lambda: _lookup_uncached(key, artist, title))
+    except Exception as e:
+        # Errors are not cached, only real "no match" answers are
+        record_error("deezer", e)
+        print(f"Deezer search error: {e}")
+        return None
+
+
+async def search_deezer(artist: str, title: str) -> Optional[dict]:
+    """Search Deezer for a track and return preview URL"""
+    return await public_track(await lookup_track(artist, title))
+
+
+async def warm_track_cache(catalog: TrackCatalog, limit: int = TRACK_CATALOG_WARM_LIMIT) -> int:
+    """Bulk-load the newest catalog rows that are still fresh into track_cache"""
+    entries = await catalog.recent(limit, max_age=TRACK_CACHE_TTL)
+    now = time.time()
+    # Oldest first so the newest rows end up most recently used
+    for key, track, fetched_at in reversed(entries):
+        track_cache.set(key, track, ttl=TRACK_CACHE_TTL - (now - fetched_at))
+    return len(entries)
+
+
+def _track_pair(track_req) -> Optional[tuple]:
+    """(artist, title) for a valid LLM pick, else None"""
+    if not isinstance(track_req, dict):
+        return None
+    artist = track_req.get("artist", "")
+    title = track_req.get("title", "")
+    if artist and title:
+        return artist, title
+    return None
+
+
+class TrackResolver:
+    """
+    Starts a Deezer lookup the moment each LLM pick is known, with a bounded
+    fan-out and per-lookup timeout. Only the first `limit` picks count, like
+    the UI expects. Results are keyed by the pick's index among valid picks.
+    Events carry public tracks; stored() keeps the cached form for reuse.
+    """
+
+    def __init__(
+        self,
+        limit: int = MAX_TRACKS,
+        fanout: int = DEEZER_FANOUT,
+        timeout: float = DEEZER_LOOKUP_TIMEOUT,
+    ):
+        self.limit = limit
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(fanout)
+        self.picks = 0
+        self._tasks: list = []
+        self._reported: set = set()
+        self.timed_out = 0
+
+    def add(self, track_req):
+        if self.picks >= self.limit:
+            return
+        self.picks += 1
+        pair = _track_pair(track_req)
+        if pair is not None:
+            self._tasks.append(asyncio.create_task(self._lookup(*pair)))
+
+    async def _lookup(self, artist: str, title: str) -> tuple:
+        """(cached form, public form) of the track, or (None, None)"""
+        async with self._slots:
+            try:
+                return await asyncio.wait_for(self._resolve(artist, title), self.timeout)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                print(f"Deezer lookup timed out: {artist} - {title}")
+                return None, None
+
+    @staticmethod
+    async def _resolve(artist: str, title: str) -> tuple:
+        track = await lookup_track(artist, title)
+        return track, await public_track(track)
+
+    def ready(self):
+        """Yield (index, track) for lookups that finished since the last call"""
+        for index, task in enumerate(self._tasks):
+            if index not in self._reported and task.done():
+                self._reported.add(index)
+                _, track = task.result()
+                if track:
+                    yield index, track
+
+    async def remaining(self):
+        """Yield (index, track) for the outstanding lookups as they finish"""
+        pending = [
+            task for index, task in enumerate(self._tasks)
+            if index not in self._reported
+        ]
+        while pending:
+            _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for index, track in self.ready():
+                yield index, track
+
+    async def results(self) -> list:
+        """All resolved tracks in the LLM's order"""
+        pairs = await asyncio.gather(*self._tasks)
+        return [track for _, track in pairs if track]
+
+    async def stored(self) -> list:
+        """results() as the caches keep them, for replaying through public_track()"""
+        pairs = await asyncio.gather(*self._tasks)
+        return [track for track, _ in pairs if track]
+
+    def cancel(self):
+        for task in self._tasks:
+            task.cancel()
+
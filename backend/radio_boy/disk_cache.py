@@ -0,0 +1,180 @@
+"""
+Size-bounded on-disk file cache with least-recently-used eviction
+
+Entries are plain files named by key, so they can be served straight off
+disk with media.file_response. New entries are written to a `.part` file and
+renamed into place when complete, so a crash or an aborted download never
+leaves a truncated entry; stale leftovers are cleared on startup. Recency
+survives restarts through the files' access times, which are set on every
+hit; modification times are left alone so Last-Modified stays stable.
+
+Several workers can share one directory: an entry another worker wrote is
+picked up on the first lookup that misses the index, and one another worker
+evicted is treated as a miss. Each worker enforces `max_bytes` over the
+entries it knows about.
+"""
+import os
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import anyio
+
+# Unfinished writes older than this are leftovers from a crash; younger ones
+# may belong to another worker sharing the directory
+STALE_PART_SECONDS = 10 * 60
+
+
+class CacheWriter:
+    """Streams one new entry to disk; commit() publishes it, abort() discards it"""
+
+    def __init__(self, cache: "DiskCache", name: str):
+        self.cache = cache
+        self.name = name
+        self.tmp_path = cache.directory / f".{name}.{uuid.uuid4().hex}.part"
+        self.size = 0
+        self.too_big = False
+        self._file = None
+
+    async def write(self, chunk: bytes):
+        if self.too_big:
+            return
+        self.size += len(chunk)
+        if self.size > self.cache.max_file_bytes:
+            # Keep serving the caller, just don't cache something this large
+            self.too_big = True
+            await self.abort()
+            return
+        if self._file is None:
+            self._file = await anyio.open_file(self.tmp_path, "wb")
+        await self._file.write(chunk)
+
+    async def commit(self) -> Optional[Path]:
+        if self.too_big or self._file is None:
+            await self.abort()
+            return None
+        try:
+            await self._file.aclose()
+            self._file = None
+            path = self.cache.directory / self.name
+            await anyio.to_thread.run_sync(os.replace, self.tmp_path, path)
+        except OSError as e:
+            print(f"Disk cache write error for {self.name}: {e}")
+            await self.abort()
+            return None
+        self.cache._add(self.name, self.size)
+        return path
+
+    async def abort(self):
+        try:
+            if self._file is not None:
+                await self._file.aclose()
+                self._file = None
+            await anyio.to_thread.run_sync(os.unlink, self.tmp_path)
+        except OSError:
+            pass
+        finally:
+            self.cache._filling.discard(self.name)
+
+
+class DiskCache:
+    """Files in `directory`, evicted least-recently-used once they exceed `max_bytes`"""
+
+    def __init__(self, directory: Path, max_bytes: int, max_file_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self._entries: OrderedDict = OrderedDict()
+        self._filling: set = set()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._scan()
+
+    def _scan(self):
+        """Rebuild the index from disk, oldest first, dropping stale unfinished writes"""
+        found = []
+        stale_before = time.time() - STALE_PART_SECONDS
+        for path in self.directory.iterdir():
+            try:
+                if not path.is_file():
+                    continue
+                stat = path.stat()
+            except FileNotFoundError:
+                # Renamed or evicted by another worker mid-scan
+                continue
+            if path.name.endswith(".part"):
+                if stat.st_mtime < stale_before:
+                    path.unlink(missing_ok=True)
+                continue
+            found.append((max(stat.st_atime, stat.st_mtime), path.name, stat.st_size))
+        for _, name, size in sorted(found):
+            self._entries[name] = size
+            self.bytes += size
+        self._evict()
+
+    def get(self, name: str) -> Optional[Path]:
+        """Path of a cached entry (and mark it recently used), or None"""
+        path = self.directory / name
+        if name not in self._entries and not self._adopt(name, path):
+            self.misses += 1
+            return None
+        try:
+            os.utime(path, (time.time(), path.stat().st_mtime))
+        except FileNotFoundError:
+            # Removed behind our back
+            self.bytes -= self._entries.pop(name)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(name)
+        self.hits += 1
+        return path
+
+    def _adopt(self, name: str, path: Path) -> bool:
+        """Index a finished entry written by another process, if there is one"""
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            return False
+        self._entries[name] = size
+        self.bytes += size
+        return True
+
+    def writer(self, name: str) -> Optional[CacheWriter]:
+        """A writer for a new entry, or None if another request is already filling it"""
+        if name in self._filling:
+            return None
+        self._filling.add(name)
+        return CacheWriter(self, name)
+
+    def _add(self, name: str, size: int):
+        self._filling.discard(name)
+        if name in self._entries:
+            self.bytes -= self._entries.pop(name)
+        self._entries[name] = size
+        self.bytes += size
+        self._evict()
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+            (self.directory / name).unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "filling": len(self._filling),
+        }
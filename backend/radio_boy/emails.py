@@ -0,0 +1,301 @@
+"""
+Signup email store
+
+Dedupe runs against an in-memory hashed index of normalized addresses, so a
+signup is O(1) and never waits on disk. The SQLite store queues new addresses
+and writes them in batches from a background task on a dedicated thread
+(the same write-behind shape as the track catalog); on startup it rebuilds
+the index from the database, which SQLite's WAL recovery keeps consistent
+after a crash. Only addresses queued in the last flush interval can be lost
+to a hard kill; a normal shutdown flushes them.
+
+When several workers share the database (a shared state backend, see
+radio_boy/state.py), each one's index only knows the addresses it has seen,
+so a signup it hasn't seen is inserted right away (INSERT OR IGNORE) and the
+database's answer decides whether it is new. That one-row write is the only
+disk wait on the signup path; the count is read from the database.
+"""
+import asyncio
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from radio_boy.metrics import record_error
+
+DEFAULT_PATH = Path(__file__).resolve().parent.parent / "data" / "emails.db"
+# Empty string keeps emails in process memory only (lost on restart)
+EMAIL_STORE_PATH = os.getenv("EMAIL_STORE_PATH", str(DEFAULT_PATH))
+EMAIL_STORE_BATCH = int(os.getenv("EMAIL_STORE_BATCH", "100"))
+EMAIL_STORE_FLUSH_INTERVAL = float(os.getenv("EMAIL_STORE_FLUSH_INTERVAL", "1"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS emails (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    email      TEXT NOT NULL UNIQUE,
+    created_at REAL NOT NULL
+);
+"""
+
+
+def normalize_email(email) -> Optional[str]:
+    """Trimmed, case-folded address, or None if it can't be an email"""
+    if not isinstance(email, str):
+        return None
+    email = email.strip().casefold()
+    if not email or "@" not in email or len(email) > 320:
+        return None
+    return email
+
+
+class EmailStore:
+    """In-process store: a set for dedupe plus rows in signup order"""
+
+    def __init__(self):
+        self._index: set = set()
+        self._rows: list = []
+        self.added = 0
+        self.duplicates = 0
+
+    def add(self, email) -> bool:
+        """Record a signup; False when the address is invalid or already known"""
+        key = normalize_email(email)
+        if key is None:
+            return False
+        if self._known(key):
+            self.duplicates += 1
+            return False
+        self._index.add(key)
+        self.added += 1
+        self._append((key, time.time()))
+        return True
+
+    def _known(self, key: str) -> bool:
+        return key in self._index
+
+    def _append(self, row: tuple):
+        self._rows.append(row)
+
+    def __contains__(self, email) -> bool:
+        key = normalize_email(email)
+        return key is not None and self._known(key)
+
+    def count(self) -> int:
+        return len(self._index)
+
+    async def page(self, after: int = 0, limit: int = 100) -> list:
+        """Up to `limit` rows with id > `after` as (id, email, created_at), oldest first"""
+        rows = self._rows[after:after + limit]
+        return [(after + i + 1, email, created_at) for i, (email, created_at) in enumerate(rows)]
+
+    async def iter_rows(self, batch: int = 1000):
+        """Every row, oldest first, fetched `batch` at a time"""
+        after = 0
+        while True:
+            rows = await self.page(after, batch)
+            for row in rows:
+                yield row
+            if len(rows) < batch:
+                return
+            after = rows[-1][0]
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "count": self.count(),
+            "added": self.added,
+            "duplicates": self.duplicates,
+        }
+
+
+class SQLiteEmailStore(EmailStore):
+    """Durable store: SQLite (WAL) written in batches behind the in-memory index"""
+
+    def __init__(self, path: str, shared: bool = False):
+        super().__init__()
+        self.path = path
+        self.shared = shared
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        # Shared mode: inline inserts and lookups, so every worker agrees on
+        # which signups are new
+        self.inline = sqlite3.connect(path, timeout=5, check_same_thread=False) if shared else None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="emails")
+        self._pending: list = []
+        self._wake: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self.writes = 0
+        self.recovered = 0
+
+    # -- synchronous API (store thread) --
+
+    def _load_index(self) -> set:
+        return {email for (email,) in self.db.execute("SELECT email FROM emails")}
+
+    def _insert_many(self, rows: list):
+        # OR IGNORE keeps other processes sharing the file from failing the batch
+        with self.db:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO emails (email, created_at) VALUES (?, ?)", rows
+            )
+        self.writes += len(rows)
+
+    def _select_page(self, after: int, limit: int) -> list:
+        return self.db.execute(
+            "SELECT id, email, created_at FROM emails WHERE id > ? ORDER BY id LIMIT ?",
+            (after, limit),
+        ).fetchall()
+
+    # -- shared database access (request path, shared mode only) --
+
+    def add(self, email) -> bool:
+        if self.inline is None:
+            return super().add(email)
+        key = normalize_email(email)
+        if key is None:
+            return False
+        if key in self._index:
+            self.duplicates += 1
+            return False
+        try:
+            with self.inline:
+                inserted = self.inline.execute(
+                    "INSERT OR IGNORE INTO emails (email, created_at) VALUES (?, ?)",
+                    (key, time.time()),
+                ).rowcount
+        except sqlite3.Error as e:
+            # Queue it like a private store would; the batch insert still dedupes
+            record_error("emails", e)
+            print(f"Email store write error: {e}")
+            return super().add(email)
+        self._index.add(key)
+        if not inserted:
+            self.duplicates += 1
+            return False
+        self.added += 1
+        self.writes += 1
+        return True
+
+    def _known(self, key: str) -> bool:
+        if key in self._index:
+            return True
+        if self.inline is None:
+            return False
+        try:
+            found = self.inline.execute("SELECT 1 FROM emails WHERE email = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            record_error("emails", e)
+            return False
+        if found is None:
+            return False
+        self._index.add(key)
+        return True
+
+    def count(self) -> int:
+        if self.inline is None:
+            return super().count()
+        try:
+            return self.inline.execute("SELECT COUNT(*) FROM emails").fetchone()[0]
+        except sqlite3.Error:
+            return super().count()
+
+    # -- async API (request path) --
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _append(self, row: tuple):
+        self._pending.append(row)
+        if len(self._pending) >= EMAIL_STORE_BATCH and self._wake is not None:
+            self._wake.set()
+
+    async def page(self, after: int = 0, limit: int = 100) -> list:
+        await self.flush()
+        return await self._run(self._select_page, after, limit)
+
+    async def flush(self):
+        if self._pending:
+            batch, self._pending = self._pending, []
+            try:
+                await self._run(self._insert_many, batch)
+            except sqlite3.Error as e:
+                # Keep the batch for the next attempt rather than dropping signups
+                self._pending = batch + self._pending
+                record_error("emails", e)
+                print(f"Email store write error: {e}")
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), EMAIL_STORE_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def start(self):
+        """Rebuild the dedupe index from disk, then start the writer"""
+        self._index = await self._run(self._load_index)
+        self.recovered = len(self._index)
+        self._wake = asyncio.Event()
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        await self._run(self.db.close)
+        self._executor.shutdown(wait=True)
+        if self.inline is not None:
+            self.inline.close()
+
+    def stats(self) -> dict:
+        return {
+            **super().stats(),
+            "backend": "sqlite",
+            "shared": self.shared,
+            "path": self.path,
+            "recovered": self.recovered,
+            "writes": self.writes,
+            "pending": len(self._pending),
+        }
+
+
+_store: Optional[EmailStore] = None
+
+
+def get_email_store() -> EmailStore:
+    """The running store; an in-memory one outside the lifespan"""
+    global _store
+    if _store is None:
+        _store = EmailStore()
+    return _store
+
+
+async def start_email_store(path: str = EMAIL_STORE_PATH, shared: bool = False) -> EmailStore:
+    global _store
+    _store = SQLiteEmailStore(path, shared) if path else EmailStore()
+    await _store.start()
+    return _store
+
+
+async def close_email_store():
+    global _store
+    if _store is not None:
+        await _store.close()
+        _store = None
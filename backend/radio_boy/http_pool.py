@@ -0,0 +1,124 @@
+"""
+Process-wide pooled HTTP client for outbound music-API calls
+Started and closed by the app lifespan so DNS, TCP and TLS setup are paid once
+"""
+import importlib.util
+import os
+from typing import Optional
+
+import httpx
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "5"))
+# HTTP/2 needs the optional `h2` package (pip install "httpx[http2]")
+HTTP2_ENABLED = (
+    os.getenv("HTTP2_ENABLED", "1") == "1"
+    and importlib.util.find_spec("h2") is not None
+)
+
+
+class HTTPPool:
+    """Shared httpx.AsyncClient plus in-flight counters for sizing the pool"""
+
+    def __init__(
+        self,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive: int = HTTP_MAX_KEEPALIVE,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+        read_timeout: float = HTTP_READ_TIMEOUT,
+        http2: bool = HTTP2_ENABLED,
+    ):
+        self.max_connections = max_connections
+        self.http2 = http2
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(
+                read_timeout, connect=connect_timeout, pool=connect_timeout
+            ),
+            http2=http2,
+        )
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests_total = 0
+        self.errors_total = 0
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        self.in_flight += 1
+        self.requests_total += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            return await self.client.get(url, **kwargs)
+        except Exception:
+            self.errors_total += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    async def get_stream(self, url: str, **kwargs) -> httpx.Response:
+        """
+        GET with the body left unread; the caller must `await response.aclose()`.
+        Counts as in flight until then, since it holds a connection all along.
+        """
+        self.in_flight += 1
+        self.requests_total += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            request = self.client.build_request("GET", url, **kwargs)
+            response = await self.client.send(request, stream=True, follow_redirects=True)
+        except BaseException as e:
+            self.in_flight -= 1
+            if isinstance(e, Exception):
+                self.errors_total += 1
+            raise
+        close = response.aclose
+        released = False
+
+        async def aclose():
+            nonlocal released
+            if not released:
+                released = True
+                self.in_flight -= 1
+            await close()
+
+        response.aclose = aclose
+        return response
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "max_connections": self.max_connections,
+            "utilization": self.in_flight / self.max_connections,
+            "requests_total": self.requests_total,
+            "errors_total": self.errors_total,
+            "http2": self.http2,
+        }
+
+    async def close(self):
+        await self.client.aclose()
+
+
+_pool: Optional[HTTPPool] = None
+
+
+def get_pool() -> HTTPPool:
+    """Return the shared pool, creating it on first use outside the lifespan"""
+    global _pool
+    if _pool is None:
+        _pool = HTTPPool()
+    return _pool
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
@@ -0,0 +1,124 @@
+"""
+Async OpenAI completion path
+One AsyncOpenAI client per process, created and closed by the app lifespan
+"""
+import asyncio
+import os
+import time
+from typing import Optional
+
+from openai import AsyncOpenAI
+
+from radio_boy.metrics import (
+    OPENAI_DURATION,
+    OPENAI_IN_FLIGHT,
+    OPENAI_TOKENS,
+    OPENAI_TTFT,
+    record_error,
+)
+
+MODEL_NAME = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+# Max completions in flight per process; extra chats wait for a slot
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+# Per-call timeout in seconds (covers the whole upstream request)
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "1"))
+
+
+def _count_tokens(usage):
+    if usage is not None:
+        OPENAI_TOKENS.labels("prompt").inc(usage.prompt_tokens)
+        OPENAI_TOKENS.labels("completion").inc(usage.completion_tokens)
+
+
+class LLMClient:
+    """AsyncOpenAI wrapper with a concurrency limit and per-call timeouts"""
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        timeout: float = LLM_TIMEOUT,
+        max_retries: int = LLM_MAX_RETRIES,
+        model: str = MODEL_NAME,
+    ):
+        self.model = model
+        self.client = AsyncOpenAI(timeout=timeout, max_retries=max_retries)
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    async def complete(
+        self,
+        messages: list,
+        model: Optional[str] = None,
+        temperature: float = 0.8,
+        timeout: Optional[float] = None,
+        **options,
+    ) -> str:
+        """
+        Run one chat completion and return the stripped message text.
+        Extra `options` (response_format, max_tokens, ...) go straight to OpenAI.
+        """
+        async with self._slots:
+            started = time.perf_counter()
+            OPENAI_IN_FLIGHT.inc()
+            try:
+                response = await self.client.chat.completions.create(
+                    model=model or self.model,
+                    messages=messages,
+                    temperature=temperature,
+                    timeout=timeout or self.timeout,
+                    **options,
+                )
+            except Exception as e:
+                record_error("openai", e)
+                raise
+            finally:
+                OPENAI_IN_FLIGHT.dec()
+                OPENAI_DURATION.labels("complete").observe(time.perf_counter() - started)
+        _count_tokens(response.usage)
+        return (response.choices[0].message.content or "").strip()
+
+    async def stream(
+        self,
+        messages: list,
+        model: Optional[str] = None,
+        temperature: float = 0.8,
+        timeout: Optional[float] = None,
+        **options,
+    ):
+        """Yield the completion text piece by piece as it is generated"""
+        async with self._slots:
+            started = time.perf_counter()
+            first_token = True
+            stream = None
+            OPENAI_IN_FLIGHT.inc()
+            try:
+                stream = await self.client.chat.completions.create(
+                    model=model or self.model,
+                    messages=messages,
+                    temperature=temperature,
+                    timeout=timeout or self.timeout,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    **options,
+                )
+                async for chunk in stream:
+                    _count_tokens(chunk.usage)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        if first_token:
+                            first_token = False
+                            OPENAI_TTFT.observe(time.perf_counter() - started)
+                        yield chunk.choices[0].delta.content
+            except Exception as e:
+                record_error("openai", e)
+                raise
+            finally:
+                OPENAI_IN_FLIGHT.dec()
+                OPENAI_DURATION.labels("stream").observe(time.perf_counter() - started)
+                # Stops the upstream generation if our client went away
+                if stream is not None:
+                    await stream.close()
+
+    async def close(self):
+        await self.client.close()
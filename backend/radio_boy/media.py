@@ -0,0 +1,216 @@
+"""
+Cache-friendly file serving for media (the header animation, and later cached
+previews and covers)
+
+Files in public/ are hashed once at startup into a manifest and served under
+content-hashed URLs with immutable caching. Every file response carries
+ETag / Last-Modified for revalidation and honours single byte-range requests
+(206), which browsers use to seek and to start video playback early. Whole
+files go out via the ASGI pathsend extension (zero-copy sendfile) when the
+server offers it, and in fixed-size chunks read off the event loop otherwise.
+"""
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Optional
+
+import anyio
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+MEDIA_DIR = Path(__file__).resolve().parent.parent / "public"
+MEDIA_CHUNK_SIZE = 256 * 1024
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+MEDIA_TYPES = {
+    ".mp4": "video/mp4",
+    ".webm": "video/webm",
+    ".mp3": "audio/mpeg",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".webp": "image/webp",
+}
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: str, size: int) -> Optional[tuple]:
+    """
+    (start, end) inclusive for a single `bytes=` range, or None to serve the
+    whole file (no/malformed header, or several ranges)
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiable
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _if_range_ok(request: Request, etag: str, last_modified: str) -> bool:
+    if_range = request.headers.get("if-range")
+    return if_range is None or if_range.strip() in (etag, last_modified)
+
+
+class FileRangeResponse(Response):
+    """Sends `path` (or bytes start..end of it) without loading it into memory"""
+
+    def __init__(self, path: Path, start: int, end: int, status_code: int,
+                 headers: dict, media_type: str, whole_file: bool):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.length = end - start + 1
+        self.whole_file = whole_file
+        self.headers["content-length"] = str(self.length)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await send({"type": "http.response.start", "status": self.status_code,
+                    "headers": self.raw_headers})
+        if scope.get("method") == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+        if self.whole_file and "http.response.pathsend" in scope.get("extensions", {}):
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+            return
+        remaining = self.length
+        async with await anyio.open_file(self.path, "rb") as f:
+            await f.seek(self.start)
+            while remaining > 0:
+                chunk = await f.read(min(MEDIA_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk,
+                            "more_body": remaining > 0})
+        if remaining > 0:
+            # File shrank underneath us; end the body rather than hang
+            await send({"type": "http.response.body", "body": b""})
+
+
+def file_response(request: Request, path: Path, *, etag: str, media_type: str,
+                  cache_control: str, size: Optional[int] = None,
+                  mtime: Optional[float] = None) -> Response:
+    """Conditional, range-aware response for a file on disk"""
+    if size is None or mtime is None:
+        stat = path.stat()
+        size, mtime = stat.st_size, stat.st_mtime
+    last_modified = formatdate(mtime, usegmt=True)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": last_modified,
+        "Cache-Control": cache_control,
+    }
+    if _not_modified(request, etag, mtime):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if range_header and _if_range_ok(request, etag, last_modified):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    if byte_range is None or byte_range == (0, size - 1):
+        return FileRangeResponse(path, 0, size - 1, 200, headers, media_type, whole_file=True)
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return FileRangeResponse(path, start, end, 206, headers, media_type, whole_file=False)
+
+
+def file_digest(path: Path) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+class MediaFile:
+    def __init__(self, path: Path):
+        stat = path.stat()
+        self.path = path
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        self.digest = file_digest(path)
+        self.etag = f'"{self.digest[:20]}"'
+        self.media_type = MEDIA_TYPES[path.suffix.lower()]
+        self.hashed_name = f"{path.stem}.{self.digest[:12]}{path.suffix}"
+
+    def response(self, request: Request) -> Response:
+        return file_response(
+            request, self.path, etag=self.etag, media_type=self.media_type,
+            cache_control=IMMUTABLE, size=self.size, mtime=self.mtime,
+        )
+
+
+class MediaManifest:
+    """Media files in a directory, hashed once so URLs can be cached forever"""
+
+    def __init__(self, directory: Path = MEDIA_DIR, prefix: str = "/media/"):
+        self.prefix = prefix
+        self.by_name = {}
+        self.by_hashed_name = {}
+        if directory.is_dir():
+            for path in sorted(directory.iterdir()):
+                if path.is_file() and path.suffix.lower() in MEDIA_TYPES:
+                    media = MediaFile(path)
+                    self.by_name[path.name] = media
+                    self.by_hashed_name[media.hashed_name] = media
+
+    def url(self, name: str, fallback: Optional[str] = None) -> str:
+        """Hashed URL for `name`, or `fallback` when the file isn't present"""
+        media = self.by_name.get(name)
+        if media is None:
+            return fallback if fallback is not None else f"/static/{name}"
+        return self.prefix + media.hashed_name
+
+    def get(self, hashed_name: str) -> Optional[MediaFile]:
+        return self.by_hashed_name.get(hashed_name)
+
+    def stats(self) -> dict:
+        return {name: {"url": self.url(name), "bytes": media.size}
+                for name, media in self.by_name.items()}
+
+
+def media_url(name: str, base: str = "", directory: Path = MEDIA_DIR) -> Optional[str]:
+    """Hashed URL of one file without building a whole manifest (for other front ends)"""
+    path = directory / name
+    if not path.is_file():
+        return None
+    digest = file_digest(path)
+    return f"{base.rstrip('/')}/media/{path.stem}.{digest[:12]}{path.suffix}"
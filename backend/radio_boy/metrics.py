@@ -0,0 +1,235 @@
+"""
+Minimal in-process Prometheus metrics
+
+Counters, gauges and histograms are plain Python numbers updated on the
+event loop thread (no locks, no background work); render() produces the
+Prometheus text format for the /metrics endpoint.
+"""
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+# Latency buckets in seconds, from cache hits up to slow LLM replies
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+    0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+REGISTRY: list = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: dict = {}
+        REGISTRY.append(self)
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        return _Value()
+
+    def _samples(self):
+        for values, child in self._children.items():
+            yield self.name + _labels(self.labelnames, values), child.value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(f"{series} {_number(value)}" for series, value in self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (),
+                 buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _samples(self):
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                yield self.name + "_bucket" + _labels(self.labelnames, values, le), cumulative
+            yield self.name + "_sum" + _labels(self.labelnames, values), child.sum
+            yield self.name + "_count" + _labels(self.labelnames, values), child.count
+
+
+class CallbackMetric(_Metric):
+    """
+    Metric whose samples are read from `fn` at scrape time, for numbers other
+    components already keep (cache stats, pool counters). `fn` returns
+    {label_values_tuple: value}.
+    """
+
+    def __init__(self, name: str, help: str, type: str, labelnames: Iterable[str],
+                 fn: Callable[[], dict]):
+        super().__init__(name, help, labelnames)
+        self.type = type
+        self.fn = fn
+
+    def _samples(self):
+        for values, value in self.fn().items():
+            yield self.name + _labels(self.labelnames, values), value
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# -- metrics shared across modules --
+
+HTTP_REQUESTS = Counter(
+    "radio_boy_http_requests_total", "HTTP requests by route and status",
+    ("method", "route", "status"),
+)
+HTTP_DURATION = Histogram(
+    "radio_boy_http_request_duration_seconds",
+    "HTTP request latency by route, until the last body byte is sent", ("route",),
+)
+HTTP_IN_FLIGHT = Gauge("radio_boy_http_requests_in_flight", "HTTP requests being served")
+
+OPENAI_DURATION = Histogram(
+    "radio_boy_openai_request_duration_seconds", "OpenAI call latency", ("mode",),
+)
+OPENAI_TTFT = Histogram(
+    "radio_boy_openai_time_to_first_token_seconds", "Streaming OpenAI time to first token",
+)
+OPENAI_IN_FLIGHT = Gauge("radio_boy_openai_requests_in_flight", "OpenAI calls in flight")
+OPENAI_TOKENS = Counter(
+    "radio_boy_openai_tokens_total", "OpenAI tokens used", ("kind",),
+)
+
+PARSE_DURATION = Histogram(
+    "radio_boy_reply_parse_duration_seconds", "Validation time for a finished reply",
+)
+DEEZER_DURATION = Histogram(
+    "radio_boy_deezer_lookup_duration_seconds", "Deezer search latency (network only)",
+    ("result",),
+)
+
+ERRORS = Counter("radio_boy_errors_total", "Errors by stage and exception type", ("stage", "type"))
+
+
+def record_error(stage: str, error: BaseException):
+    ERRORS.labels(stage, type(error).__name__).inc()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, latency and in-flight requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        HTTP_IN_FLIGHT.inc()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # Label by route template, not raw path, to keep cardinality bounded
+            route = scope.get("route")
+            route = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUESTS.labels(scope["method"], route, str(status)).inc()
+            HTTP_DURATION.labels(route).observe(time.perf_counter() - started)
@@ -0,0 +1,240 @@
+"""
+One chat turn end to end: stream the completion, parse it incrementally and
+resolve tracks on Deezer while the rest of the reply is still generating
+"""
+import hashlib
+import os
+import re
+import time
+import unicodedata
+from typing import Optional
+
+from radio_boy.cache import MISSING
+from radio_boy.deezer import TrackResolver, public_track
+from radio_boy.llm import LLMClient
+from radio_boy.metrics import PARSE_DURATION, record_error
+from radio_boy.prompts import SYSTEM_PROMPT
+from radio_boy.replies import (
+    REPLY_RESPONSE_FORMAT,
+    Reply,
+    ReplyStreamParser,
+    parse_reply,
+    validate_block,
+    validate_reply,
+)
+from radio_boy.sessions import build_messages, session_key, sessions
+from radio_boy.singleflight import SingleFlight
+from radio_boy.state import get_state
+
+# Ask OpenAI to enforce the reply schema (json_schema response format)
+STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "1") == "1"
+# One repair round-trip is allowed for a reply that fails validation
+REPAIR_MAX_TOKENS = int(os.getenv("LLM_REPAIR_MAX_TOKENS", "1000"))
+REPAIR_TIMEOUT = float(os.getenv("LLM_REPAIR_TIMEOUT", "15"))
+REPAIR_PROMPT = (
+    "Your last reply was not valid JSON in the required format. "
+    "Send the same answer again as one JSON object with exactly the keys "
+    "message, tracks, lyrics and workflow, and nothing else."
+)
+
+# Counts replies that needed a repair round-trip or fell back to plain text
+parse_stats = {"valid": 0, "invalid": 0, "repaired": 0, "unrepaired": 0}
+
+# Finished replies (tracks already resolved) for repeated single-turn prompts.
+# Tracks are kept as the track cache holds them; public_track() runs on replay.
+REPLY_CACHE_TTL = float(os.getenv("REPLY_CACHE_TTL", "3600"))
+REPLY_CACHE_MAX_ENTRIES = int(os.getenv("REPLY_CACHE_MAX_ENTRIES", "2000"))
+REPLY_CACHE_MAX_BYTES = int(os.getenv("REPLY_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+reply_cache = get_state().cache(
+    "replies",
+    max_entries=REPLY_CACHE_MAX_ENTRIES,
+    max_bytes=REPLY_CACHE_MAX_BYTES,
+    ttl=REPLY_CACHE_TTL,
+)
+
+# Identical prompts arriving together share one completion and its lookups
+reply_flights = SingleFlight()
+
+# Filler words that don't change the vibe being asked for
+_STOPWORDS = {
+    "a", "an", "the", "for", "to", "of", "some", "me", "my", "i", "im",
+    "please", "pls", "give", "want", "need", "music", "songs", "song", "tracks",
+}
+# "Lo-fi" -> "lofi", "rock'n'roll" -> "rocknroll"; other punctuation splits words
+_JOINERS_RE = re.compile(r"(?<=\w)['’-](?=\w)")
+_PUNCTUATION_RE = re.compile(r"[^\w\s]|_")
+
+
+def _stem(word: str) -> str:
+    """Very light suffix folding: studying -> study, vibes -> vibe"""
+    if len(word) > 5 and word.endswith("ing"):
+        return word[:-3]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def normalize_prompt(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _PUNCTUATION_RE.sub(" ", _JOINERS_RE.sub("", text))
+    return " ".join(_stem(word) for word in text.split() if word not in _STOPWORDS)
+
+
+def reply_cache_key(model: str, messages: list) -> Optional[str]:
+    """
+    Key for a [system, user] request: model + system prompt hash + normalized
+    prompt. Requests carrying earlier turns depend on context, so no key.
+    """
+    if len(messages) != 2 or messages[0]["role"] != "system":
+        return None
+    system_hash = hashlib.sha256(messages[0]["content"].encode()).hexdigest()
+    prompt = normalize_prompt(messages[1]["content"])
+    if not prompt:
+        return None
+    return hashlib.sha256(f"{model}\0{system_hash}\0{prompt}".encode()).hexdigest()
+
+
+def _llm_options() -> dict:
+    return {"response_format": REPLY_RESPONSE_FORMAT} if STRUCTURED_OUTPUT else {}
+
+
+async def repair_reply(llm: LLMClient, messages: list, content: str) -> Optional[Reply]:
+    """One bounded retry asking the model to restate `content` in the schema"""
+    try:
+        repaired = await llm.complete(
+            messages + [
+                {"role": "assistant", "content": content},
+                {"role": "user", "content": REPAIR_PROMPT},
+            ],
+            temperature=0,
+            timeout=REPAIR_TIMEOUT,
+            max_tokens=REPAIR_MAX_TOKENS,
+            **_llm_options(),
+        )
+    except Exception as e:
+        record_error("repair", e)
+        print(f"Reply repair error: {e}")
+        return None
+    return validate_reply(repaired, ReplyStreamParser().feed_all(repaired))
+
+
+async def _cached_events(reply: dict):
+    """Replay a cached reply as the same events a live one produces"""
+    yield "token", reply["message"]
+    for kind in ("lyrics", "workflow"):
+        if reply[kind]:
+            yield kind, reply[kind]
+    tracks = []
+    for index, stored in enumerate(reply["tracks"]):
+        track = await public_track(stored)
+        tracks.append(track)
+        yield "track", index, track
+    yield "done", {**reply, "tracks": tracks}
+
+
+async def reply_events(llm: LLMClient, messages: list, use_cache: bool = True):
+    """
+    Yield events for one reply as soon as each is ready:
+      ("token", text)            more of the assistant message
+      ("lyrics", dict) / ("workflow", dict)
+      ("track", index, track)    a resolved Deezer track; index is its
+                                 position among the LLM's picks
+      ("done", reply)            the full /chat payload
+    With use_cache=False a cached reply is ignored (and then refreshed).
+    Concurrent requests for the same cache key share one live reply.
+    """
+    cache_key = reply_cache_key(llm.model, messages)
+    if cache_key is None:
+        async for event in _live_events(llm, messages, None):
+            yield event
+        return
+
+    if use_cache:
+        cached = reply_cache.get(cache_key)
+        if cached is not MISSING:
+            async for event in _cached_events(cached):
+                yield event
+            return
+    async for event in reply_flights.stream(
+        cache_key, lambda: _live_events(llm, messages, cache_key)
+    ):
+        yield event
+
+
+async def _live_events(llm: LLMClient, messages: list, cache_key: Optional[str]):
+    parser = ReplyStreamParser()
+    resolver = TrackResolver()
+    parts = []
+    sent = set()  # lyrics / workflow blocks already yielded
+    try:
+        async for delta in llm.stream(messages, **_llm_options()):
+            parts.append(delta)
+            for kind, payload in parser.feed(delta):
+                if kind == "message":
+                    yield "token", payload
+                elif kind == "track":
+                    resolver.add(payload)
+                elif payload[0] in ("lyrics", "workflow"):
+                    # A block that fails its model waits for the validated reply
+                    block = validate_block(*payload)
+                    if block:
+                        sent.add(payload[0])
+                        yield payload[0], block
+            for index, track in resolver.ready():
+                yield "track", index, track
+
+        content = "".join(parts).strip()
+        started = time.perf_counter()
+        reply = validate_reply(content, parser.fields if parser.finished else None)
+        PARSE_DURATION.observe(time.perf_counter() - started)
+        if reply is not None:
+            parse_stats["valid"] += 1
+        else:
+            parse_stats["invalid"] += 1
+            reply = await repair_reply(llm, messages, content)
+            parse_stats["repaired" if reply is not None else "unrepaired"] += 1
+            # Picks streamed from the invalid reply don't count either way:
+            # the repaired reply brings its own, an unrepaired one gets none
+            resolver.cancel()
+            resolver = TrackResolver()
+
+        if reply is not None:
+            message = reply.message
+            lyrics = reply.lyrics.model_dump() if reply.lyrics else None
+            workflow = reply.workflow.model_dump() if reply.workflow else None
+            if not resolver.picks:
+                for pick in reply.tracks:
+                    resolver.add(pick.model_dump())
+            for kind, block in (("lyrics", lyrics), ("workflow", workflow)):
+                if block and kind not in sent:
+                    yield kind, block
+        else:
+            # Still not valid after the repair: show the text, no tracks
+            message, _, lyrics, workflow = parse_reply(content)
+            lyrics = validate_block("lyrics", lyrics)
+            workflow = validate_block("workflow", workflow)
+
+        async for index, track in resolver.remaining():
+            yield "track", index, track
+        result = {
+            "message": message,
+            "tracks": await resolver.results(),
+            "lyrics": lyrics,
+            "workflow": workflow,
+        }
+        # Only cache valid replies whose lookups all finished in time
+        if cache_key is not None and reply is not None and not resolver.timed_out:
+            reply_cache.set(cache_key, {**result, "tracks": await resolver.stored()})
+        yield "done", result
+    finally:
+        resolver.cancel()
+
+
+def start_turn(data: dict) -> tuple:
+    """(session, user_message, messages) for a chat request body from either front end"""
+    user_message = data.get("message", "")
+    key = session_key(data)
+    session = sessions.get(key) if key else None
+    return session, user_message, build_messages(SYSTEM_PROMPT, session, user_message)
@@ -0,0 +1,166 @@
+"""
+/preview/{track_id}: Deezer's 30-second previews served from a local disk cache
+
+The first request for a track looks up a fresh preview URL (Deezer signs
+them with an expiry, so stored ones go stale), streams the audio to the
+client while writing it to the cache, and publishes the file once complete.
+Later requests, including Range requests for seeking, are served from disk.
+A Range request on a miss (Safari probes with `bytes=0-1` before it plays
+anything) is passed to Deezer and its 206 relayed, while the whole file is
+fetched into the cache in the background.
+"""
+import asyncio
+import os
+from pathlib import Path
+from typing import Optional
+
+import anyio
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from radio_boy.deezer import preview_source
+from radio_boy.disk_cache import DiskCache
+from radio_boy.http_pool import get_pool
+from radio_boy.media import file_response
+from radio_boy.metrics import record_error
+
+DEFAULT_DIR = Path(__file__).resolve().parent.parent / "data" / "previews"
+PREVIEW_CACHE_DIR = os.getenv("PREVIEW_CACHE_DIR", str(DEFAULT_DIR))
+PREVIEW_CACHE_MAX_BYTES = int(os.getenv("PREVIEW_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Previews are ~0.5 MB; anything far bigger isn't a preview
+PREVIEW_MAX_FILE_BYTES = int(os.getenv("PREVIEW_MAX_FILE_BYTES", str(5 * 1024 * 1024)))
+
+CACHE_CONTROL = "public, max-age=86400"
+# Upstream headers relayed on a miss
+RELAYED_HEADERS = ("content-length", "content-range", "accept-ranges")
+
+_cache: Optional[DiskCache] = None
+# Background cache fills, kept referenced until they finish
+_fills: set = set()
+
+
+def get_preview_cache() -> DiskCache:
+    global _cache
+    if _cache is None:
+        _cache = DiskCache(Path(PREVIEW_CACHE_DIR), PREVIEW_CACHE_MAX_BYTES, PREVIEW_MAX_FILE_BYTES)
+    return _cache
+
+
+async def _finish(upstream, writer, completed: bool):
+    """Release the upstream connection; publish the cached copy only if whole"""
+    with anyio.CancelScope(shield=True):
+        await upstream.aclose()
+        if writer is not None:
+            if completed:
+                await writer.commit()
+            else:
+                await writer.abort()
+
+
+class UpstreamResponse(StreamingResponse):
+    """
+    Relays an upstream body to the client, teeing it into the cache. Cleanup
+    lives in __call__ rather than the body generator, which Starlette abandons
+    unfinished when the client disconnects.
+    """
+
+    def __init__(self, upstream, writer, **kwargs):
+        self.upstream = upstream
+        self.writer = writer
+        self.completed = False
+        super().__init__(self._relay(), **kwargs)
+
+    async def _relay(self):
+        async for chunk in self.upstream.aiter_bytes():
+            if self.writer is not None:
+                await self.writer.write(chunk)
+            yield chunk
+        self.completed = True
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await _finish(self.upstream, self.writer, self.completed)
+
+
+async def _fill(track_id: int, source: str, writer):
+    """Download the whole preview into the cache (after a Range request missed)"""
+    try:
+        upstream = await get_pool().get_stream(source)
+    except Exception as e:
+        await writer.abort()
+        record_error("preview", e)
+        print(f"Preview fill error for {track_id}: {e}")
+        return
+    if upstream.status_code != 200:
+        await upstream.aclose()
+        await writer.abort()
+        return
+    completed = False
+    try:
+        async for chunk in upstream.aiter_bytes():
+            await writer.write(chunk)
+        completed = True
+    except Exception as e:
+        record_error("preview", e)
+        print(f"Preview fill error for {track_id}: {e}")
+    finally:
+        await _finish(upstream, writer, completed)
+
+
+def _start_fill(track_id: int, source: str, writer):
+    task = asyncio.create_task(_fill(track_id, source, writer))
+    _fills.add(task)
+    task.add_done_callback(_fills.discard)
+
+
+async def preview_response(request: Request, track_id: int) -> Response:
+    cache = get_preview_cache()
+    name = f"{track_id}.mp3"
+    path = cache.get(name)
+    if path is not None:
+        stat = path.stat()
+        return file_response(
+            request, path, etag=f'"preview-{track_id}-{stat.st_size}"', media_type="audio/mpeg",
+            cache_control=CACHE_CONTROL, size=stat.st_size, mtime=stat.st_mtime,
+        )
+
+    range_header = request.headers.get("range")
+    try:
+        source = await preview_source(track_id)
+        if source is None:
+            return Response(status_code=404)
+        upstream = await get_pool().get_stream(
+            source, headers={"Range": range_header} if range_header else None
+        )
+    except Exception as e:
+        record_error("preview", e)
+        print(f"Preview fetch error for {track_id}: {e}")
+        return Response(status_code=502)
+    if upstream.status_code == 416:
+        await upstream.aclose()
+        content_range = upstream.headers.get("content-range")
+        return Response(status_code=416, headers={"Content-Range": content_range} if content_range else None)
+    if upstream.status_code not in (200, 206):
+        await upstream.aclose()
+        return Response(status_code=502)
+
+    writer = cache.writer(name)
+    if upstream.status_code == 206:
+        # Only part of the file is coming through; fetch all of it separately
+        if writer is not None:
+            _start_fill(track_id, source, writer)
+        writer = None
+    headers = {"Cache-Control": CACHE_CONTROL}
+    if "content-encoding" not in upstream.headers:
+        headers.update({
+            key.title(): upstream.headers[key] for key in RELAYED_HEADERS if key in upstream.headers
+        })
+    return UpstreamResponse(
+        upstream, writer,
+        status_code=upstream.status_code,
+        media_type=upstream.headers.get("content-type", "audio/mpeg"),
+        headers=headers,
+    )
@@ -0,0 +1,308 @@
+"""
+Parsing of Radio Boy's JSON replies (see prompts.SYSTEM_PROMPT for the contract)
+"""
+import copy
+import json
+from typing import Optional
+
+from pydantic import BaseModel, ValidationError
+
+FALLBACK_MESSAGE = "Let me find some tracks for you..."
+
+
+class TrackPick(BaseModel):
+    artist: str
+    title: str
+
+
+class Lyrics(BaseModel):
+    hook: Optional[str] = None
+    verse: Optional[str] = None
+    structure: Optional[str] = None
+    adlibs: list[str] = []
+
+
+class Workflow(BaseModel):
+    type: str = "note"
+    title: str = ""
+    items: list[str] = []
+
+
+class Reply(BaseModel):
+    """A chat message plus optional track picks, lyrics and workflow blocks"""
+
+    message: str = FALLBACK_MESSAGE
+    tracks: list[TrackPick] = []
+    lyrics: Optional[Lyrics] = None
+    workflow: Optional[Workflow] = None
+
+
+def _strict(schema: dict) -> dict:
+    """Make every object closed with all properties required, as strict mode wants"""
+    if schema.get("type") == "object" and "properties" in schema:
+        schema["additionalProperties"] = False
+        schema["required"] = list(schema["properties"])
+    for value in schema.values():
+        if isinstance(value, dict):
+            _strict(value)
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict):
+                    _strict(item)
+    return schema
+
+
+def _without_defaults(schema: dict) -> dict:
+    schema.pop("default", None)
+    for value in schema.values():
+        if isinstance(value, dict):
+            _without_defaults(value)
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict):
+                    _without_defaults(item)
+    return schema
+
+
+REPLY_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "radio_boy_reply",
+        "strict": True,
+        "schema": _strict(_without_defaults(copy.deepcopy(Reply.model_json_schema()))),
+    },
+}
+
+
+def validate_reply(content: str, fields: Optional[dict] = None) -> Optional[Reply]:
+    """
+    Typed parse of a full reply. `fields` (from ReplyStreamParser) is used
+    when the raw text isn't bare JSON, e.g. wrapped in ```json fences.
+    """
+    try:
+        return Reply.model_validate_json(content)
+    except ValidationError:
+        pass
+    if fields is not None:
+        try:
+            return Reply.model_validate(fields)
+        except ValidationError:
+            pass
+    return None
+
+
+BLOCK_MODELS = {"lyrics": Lyrics, "workflow": Workflow}
+
+
+def validate_block(kind: str, value) -> Optional[dict]:
+    """A lyrics or workflow block checked against its model, or None if it doesn't fit"""
+    if not value:
+        return None
+    try:
+        return BLOCK_MODELS[kind].model_validate(value).model_dump()
+    except ValidationError:
+        return None
+
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+def parse_reply(content: str) -> tuple:
+    """Full reply text -> (message, track_requests, lyrics, workflow)"""
+    try:
+        if content.startswith("```"):
+            content = content.split("```")[1]
+            if content.startswith("json"):
+                content = content[4:]
+
+        parsed = json.loads(content)
+        return (
+            parsed.get("message", FALLBACK_MESSAGE),
+            parsed.get("tracks", []),
+            parsed.get("lyrics", None),
+            parsed.get("workflow", None),
+        )
+    except json.JSONDecodeError:
+        return content, [], None, None
+
+
+def _hex4(buffer: str, pos: int) -> Optional[int]:
+    """Code unit of the `\\uXXXX` escape at pos, or None if there isn't one"""
+    if buffer[pos:pos + 2] != "\\u":
+        return None
+    try:
+        return int(buffer[pos + 2:pos + 6], 16)
+    except ValueError:
+        return None
+
+
+def _decode_partial(buffer: str, pos: int, end: int, final: bool = False) -> tuple:
+    """
+    Decode JSON string content buffer[pos:end] -> (text, new_pos).
+    Stops early at an escape sequence that is cut off by `end`, including a
+    high surrogate whose low half may still be on its way; with `final`
+    (the string has closed) a lone surrogate becomes U+FFFD, which is what
+    it has to be to be sent as UTF-8.
+    """
+    out = []
+    while pos < end:
+        ch = buffer[pos]
+        if ch != "\\":
+            out.append(ch)
+            pos += 1
+            continue
+        if pos + 1 >= end:
+            break
+        code = buffer[pos + 1]
+        if code == "u":
+            if pos + 6 > end:
+                break
+            unit = _hex4(buffer, pos)
+            if unit is None:
+                out.append("\ufffd")
+            elif 0xD800 <= unit <= 0xDBFF:
+                rest = buffer[pos + 6:min(end, pos + 12)]
+                if not final and len(rest) < 6 and "\\u".startswith(rest[:2]):
+                    break
+                low = _hex4(buffer, pos + 6) if pos + 12 <= end else None
+                if low is not None and 0xDC00 <= low <= 0xDFFF:
+                    out.append(chr(0x10000 + ((unit - 0xD800) << 10) + (low - 0xDC00)))
+                    pos += 6
+                else:
+                    out.append("\ufffd")
+            elif 0xDC00 <= unit <= 0xDFFF:
+                out.append("\ufffd")
+            else:
+                out.append(chr(unit))
+            pos += 6
+        else:
+            out.append(_ESCAPES.get(code, code))
+            pos += 2
+    return "".join(out), pos
+
+
+class ReplyStreamParser:
+    """
+    Incremental parser for the reply schema, fed raw completion deltas.
+
+    feed() returns the events that became available:
+      ("message", text)     newly generated text of the "message" string
+      ("track", pick)       one {"artist", "title"} object from "tracks",
+                            as soon as its closing brace arrives
+      ("field", (key, v))   a top-level value that just completed
+    Anything before the first "{" or after the matching "}" is ignored,
+    which covers ```json fences. `finished` is set once the top-level object
+    closes and `fields` then holds every top-level value.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields = {}
+        self.finished = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None  # opening quote of a depth-1 key/value string
+        self._expect = None        # depth 1: "key", "colon", "value", "comma"
+        self._key = None
+        self._value_start = None   # start of a depth-1 container or scalar value
+        self._item_start = None    # start of the current object inside "tracks"
+        self._message_pos = None   # next undecoded char of the "message" string
+
+    def feed(self, delta: str) -> list:
+        self.buffer += delta
+        events = []
+        buffer = self.buffer
+        i = self._pos
+        while i < len(buffer) and not self.finished:
+            ch = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._end_string(i, events)
+            elif self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    self._expect = "key"
+            elif ch == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    self._string_start = i
+                    if self._expect == "value" and self._key == "message":
+                        self._message_pos = i + 1
+            elif ch in "{[":
+                self._depth += 1
+                if self._depth == 2:
+                    self._value_start = i
+                elif self._depth == 3 and self._key == "tracks" and ch == "{":
+                    self._item_start = i
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 2 and self._item_start is not None:
+                    pick = self._load(self._item_start, i + 1)
+                    if isinstance(pick, dict):
+                        events.append(("track", pick))
+                    self._item_start = None
+                elif self._depth == 1:
+                    self._end_value(self._value_start, i + 1, events)
+                elif self._depth == 0:
+                    self._end_scalar(i, events)
+                    self.finished = True
+            elif self._depth == 1:
+                if ch == ":":
+                    self._expect = "value"
+                elif ch == ",":
+                    self._end_scalar(i, events)
+                    self._expect = "key"
+                elif self._expect == "value" and not ch.isspace():
+                    # Start of a bare value: null, true, false or a number
+                    self._value_start = i
+                    self._expect = "scalar"
+            i += 1
+        self._pos = i
+
+        # Stream whatever part of the message string is complete so far
+        if self._message_pos is not None:
+            text, self._message_pos = _decode_partial(buffer, self._message_pos, i)
+            if text:
+                events.insert(0, ("message", text))
+        return events
+
+    def feed_all(self, text: str) -> Optional[dict]:
+        """Parse a complete text; the top-level fields, or None if unfinished"""
+        self.feed(text)
+        return self.fields if self.finished else None
+
+    def _load(self, start: int, end: int):
+        try:
+            return json.loads(self.buffer[start:end])
+        except json.JSONDecodeError:
+            return None
+
+    def _end_string(self, i: int, events: list):
+        if self._expect == "key":
+            self._key = self._load(self._string_start, i + 1)
+            self._expect = "colon"
+        elif self._expect == "value":
+            if self._key == "message":
+                text, _ = _decode_partial(self.buffer, self._message_pos, i, final=True)
+                if text:
+                    events.append(("message", text))
+                self._message_pos = None
+            self._end_value(self._string_start, i + 1, events)
+
+    def _end_value(self, start: int, end: int, events: list):
+        value = self._load(start, end)
+        self.fields[self._key] = value
+        events.append(("field", (self._key, value)))
+        self._expect = "comma"
+
+    def _end_scalar(self, i: int, events: list):
+        if self._expect == "scalar":
+            self._end_value(self._value_start, i, events)
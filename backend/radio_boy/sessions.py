@@ -0,0 +1,240 @@
+"""
+Server-side chat sessions
+
+Each session keeps its recent turns. Requests get the newest turns in full
+and older turns compacted (tracks reduced to Deezer ids, lyrics and
+workflow to one-line digests), within a token budget, so prompt size
+stays flat however long a conversation runs.
+
+With a shared state backend (radio_boy/state.py) each pre-rendered turn is
+appended there as its own row, so a conversation can continue on any worker
+and turns saved by different workers at the same moment are all kept.
+
+Only ids handed out by new_session_id() (POST /session) get a session, so
+a client can't pick an id, or an email, that reads someone else's history.
+"""
+import json
+import os
+import secrets
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+from radio_boy.cache import MISSING
+from radio_boy.state import get_state
+
+SESSION_MAX = int(os.getenv("SESSION_MAX", "5000"))
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", str(6 * 3600)))
+# Turns stored per session; anything older is forgotten
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "40"))
+# Newest turns sent in full; older ones are sent compacted
+SESSION_RECENT_TURNS = int(os.getenv("SESSION_RECENT_TURNS", "3"))
+# Tokens of history allowed per request (system prompt and new message excluded)
+SESSION_TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "1500"))
+
+COMPACT_TEXT_CHARS = 240
+MESSAGE_OVERHEAD_TOKENS = 4
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:  # not installed, or the encoding can't be loaded offline
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Local token estimate: tiktoken when available, else ~4 chars per token"""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+def _shorten(text: Optional[str], limit: int = COMPACT_TEXT_CHARS) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def _lyrics_digest(lyrics: Optional[dict]) -> Optional[str]:
+    if not lyrics:
+        return None
+    line = lyrics.get("hook") or lyrics.get("verse") or lyrics.get("structure")
+    return f"lyrics, hook: {_shorten(line, 80)}" if line else "lyrics"
+
+
+def _workflow_digest(workflow: Optional[dict]) -> Optional[str]:
+    if not workflow:
+        return None
+    items = workflow.get("items") or []
+    return f"{workflow.get('type', 'note')}: {workflow.get('title', '')} ({len(items)} items)"
+
+
+def _message(role: str, content: str) -> tuple:
+    return {"role": role, "content": content}, count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+class Turn:
+    """One user message and the reply it got, pre-rendered in full and compact form"""
+
+    def __init__(self, user_message: str, reply: dict):
+        tracks = reply.get("tracks") or []
+        user_full, user_full_tokens = _message("user", user_message)
+        user_compact, user_compact_tokens = _message("user", _shorten(user_message))
+        assistant_full, assistant_full_tokens = _message("assistant", json.dumps({
+            "message": reply.get("message", ""),
+            "tracks": [{"artist": t["artist"], "title": t["title"]} for t in tracks],
+            "lyrics": reply.get("lyrics"),
+            "workflow": reply.get("workflow"),
+        }))
+        assistant_compact, assistant_compact_tokens = _message("assistant", json.dumps({
+            "message": _shorten(reply.get("message")),
+            "tracks": [t["id"] for t in tracks],
+            "lyrics": _lyrics_digest(reply.get("lyrics")),
+            "workflow": _workflow_digest(reply.get("workflow")),
+        }))
+        self.full = [user_full, assistant_full]
+        self.full_tokens = user_full_tokens + assistant_full_tokens
+        self.compact = [user_compact, assistant_compact]
+        self.compact_tokens = user_compact_tokens + assistant_compact_tokens
+
+    def dump(self) -> dict:
+        return {
+            "full": self.full,
+            "full_tokens": self.full_tokens,
+            "compact": self.compact,
+            "compact_tokens": self.compact_tokens,
+        }
+
+    @classmethod
+    def load(cls, data: dict) -> "Turn":
+        """A turn from dump(), without re-rendering or re-counting tokens"""
+        turn = cls.__new__(cls)
+        turn.full = data["full"]
+        turn.full_tokens = data["full_tokens"]
+        turn.compact = data["compact"]
+        turn.compact_tokens = data["compact_tokens"]
+        return turn
+
+
+class Session:
+    def __init__(self, key: Optional[str] = None, store=None):
+        self.turns: deque = deque(maxlen=SESSION_MAX_TURNS)
+        self.last_used = time.monotonic()
+        # Set for sessions that live in a shared store and are saved per turn
+        self.key = key
+        self.store = store
+
+    def add_turn(self, user_message: str, reply: dict):
+        turn = Turn(user_message, reply)
+        self.turns.append(turn)
+        if self.store is not None:
+            self.store.append(self.key, turn)
+
+    def history(self, budget: int = SESSION_TOKEN_BUDGET) -> tuple:
+        """(messages, tokens) for the newest turns that fit in `budget`"""
+        picked = []
+        used = 0
+        for age, turn in enumerate(reversed(self.turns)):
+            if age < SESSION_RECENT_TURNS and used + turn.full_tokens <= budget:
+                picked.append(turn.full)
+                used += turn.full_tokens
+            elif used + turn.compact_tokens <= budget:
+                picked.append(turn.compact)
+                used += turn.compact_tokens
+            else:
+                break
+        messages = [message for pair in reversed(picked) for message in pair]
+        return messages, used
+
+
+class SessionStore:
+    """In-process sessions, least recently used evicted past SESSION_MAX or when idle"""
+
+    def __init__(self, max_sessions: int = SESSION_MAX, idle_ttl: float = SESSION_IDLE_TTL):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+
+    def get(self, key: str) -> Session:
+        now = time.monotonic()
+        session = self._sessions.pop(key, None)
+        if session is None or now - session.last_used > self.idle_ttl:
+            session = Session()
+        session.last_used = now
+        self._sessions[key] = session
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return session
+
+    def stats(self) -> dict:
+        return {"sessions": len(self._sessions)}
+
+
+class SharedSessionStore:
+    """Sessions in the shared state backend; idle ones expire, the oldest are pruned"""
+
+    def __init__(self, backend, max_sessions: int = SESSION_MAX, idle_ttl: float = SESSION_IDLE_TTL):
+        self.idle_ttl = idle_ttl
+        self._store = backend.log(
+            "sessions", max_keys=max_sessions, max_items=SESSION_MAX_TURNS, ttl=idle_ttl
+        )
+
+    def get(self, key: str) -> Session:
+        session = Session(key, store=self)
+        for data in self._store.items(key):
+            session.turns.append(Turn.load(data))
+        return session
+
+    def append(self, key: str, turn: Turn):
+        self._store.append(key, turn.dump())
+
+    def stats(self) -> dict:
+        return {"sessions": len(self._store), "shared": True}
+
+
+def make_session_store():
+    backend = get_state()
+    return SharedSessionStore(backend) if backend.shared else SessionStore()
+
+
+sessions = make_session_store()
+
+
+# Session ids this server issued, live until a session has been idle that long
+issued_session_ids = get_state().cache(
+    "session_ids",
+    max_entries=SESSION_MAX,
+    max_bytes=SESSION_MAX * 64,
+    ttl=SESSION_IDLE_TTL,
+)
+
+
+def new_session_id() -> str:
+    """A fresh unguessable session id, recorded as issued"""
+    session_id = secrets.token_urlsafe(24)
+    issued_session_ids.set(session_id, True)
+    return session_id
+
+
+def session_key(data: dict) -> Optional[str]:
+    """The request's session id if this server issued it; anything else gets no memory"""
+    key = data.get("session_id")
+    if not isinstance(key, str) or issued_session_ids.get(key) is MISSING:
+        return None
+    # Idle time counts from the latest turn, like the session itself
+    issued_session_ids.set(key, True)
+    return key
+
+
+def build_messages(
+    system_prompt: str,
+    session: Optional[Session],
+    user_message: str,
+    budget: int = SESSION_TOKEN_BUDGET,
+) -> list:
+    history = session.history(budget)[0] if session is not None else []
+    return (
+        [{"role": "system", "content": system_prompt}]
+        + history
+        + [{"role": "user", "content": user_message}]
+    )
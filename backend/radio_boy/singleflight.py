@@ -0,0 +1,104 @@
+"""
+Single-flight: concurrent identical calls share one upstream task
+"""
+import asyncio
+from typing import Awaitable, Callable, Hashable
+
+
+class _Call:
+    def __init__(self, fn: Callable[[], Awaitable]):
+        self.waiters = 0
+        self.task = asyncio.create_task(fn())
+
+
+class _StreamCall:
+    """Runs an async iterator once and records its items for every subscriber"""
+
+    def __init__(self, fn: Callable):
+        self.waiters = 0
+        self.items: list = []
+        self.changed = asyncio.Event()
+        self.task = asyncio.create_task(self._run(fn))
+
+    async def _run(self, fn: Callable):
+        try:
+            async for item in fn():
+                self.items.append(item)
+                self._notify()
+        finally:
+            self._notify()
+
+    def _notify(self):
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key onto one upstream task.
+    Every waiter gets the result or the exception; when the last waiter is
+    cancelled the upstream task is cancelled too.
+    """
+
+    def __init__(self):
+        self._calls: dict = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def _join(self, key: Hashable, start: Callable):
+        call = self._calls.get(key)
+        if call is None:
+            call = start()
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self.leaders += 1
+        else:
+            self.followers += 1
+        call.waiters += 1
+        return call
+
+    def _leave(self, key: Hashable, call):
+        call.waiters -= 1
+        if call.waiters == 0 and not call.task.done():
+            self._forget(key, call)
+            call.task.cancel()
+
+    def _forget(self, key: Hashable, call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        """Await fn() once per key, however many callers ask at the same time"""
+        call = self._join(key, lambda: _Call(fn))
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            self._leave(key, call)
+
+    async def stream(self, key: Hashable, fn: Callable):
+        """
+        Iterate fn() once per key; every subscriber sees every item from the
+        start, then follows the live iterator.
+        """
+        call = self._join(key, lambda: _StreamCall(fn))
+        try:
+            seen = 0
+            while True:
+                changed = call.changed
+                if seen < len(call.items):
+                    seen += 1
+                    yield call.items[seen - 1]
+                elif call.task.done():
+                    call.task.result()  # re-raise the upstream error, if any
+                    return
+                else:
+                    await changed.wait()
+        finally:
+            self._leave(key, call)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "followers": self.followers,
+        }
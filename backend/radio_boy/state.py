@@ -0,0 +1,382 @@
+"""
+Where mutable state lives: in this process, or shared by every worker
+
+The caches and chat sessions ask the configured backend for their store
+instead of building one themselves (sessions only need one when it is
+shared). The memory backend hands out the in-process TTLCache, which is
+fastest but private to one process. The SQLite backend keeps entries in one
+WAL-mode file that every worker on the host opens, so `--workers N` (or
+several instances on one disk) see the same cached replies, tracks and
+sessions. Reads run inline (WAL readers never wait on writers); writes and
+pruning go to a dedicated thread, the same write-behind shape as the track
+catalog and email store.
+
+STATE_BACKEND=memory is the default and suits a single worker.
+STATE_BACKEND=sqlite is what the multi-worker launch in radio_boy_app.py uses.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Hashable, Optional
+
+from radio_boy.cache import MISSING, TTLCache
+from radio_boy.metrics import record_error
+
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory")
+DEFAULT_PATH = Path(__file__).resolve().parent.parent / "data" / "state.db"
+STATE_PATH = os.getenv("STATE_PATH", str(DEFAULT_PATH))
+# Writes per namespace between prunes of expired and over-budget entries
+STATE_PRUNE_EVERY = int(os.getenv("STATE_PRUNE_EVERY", "200"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace  TEXT NOT NULL,
+    key        TEXT NOT NULL,
+    value      TEXT NOT NULL,
+    size       INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_updated ON entries (namespace, updated_at);
+CREATE TABLE IF NOT EXISTS logs (
+    namespace  TEXT NOT NULL,
+    key        TEXT NOT NULL,
+    seq        INTEGER NOT NULL,
+    value      TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key, seq)
+) WITHOUT ROWID;
+"""
+
+
+def _encode_key(key: Hashable) -> str:
+    # Tuples (track keys) come out as JSON lists, which is stable across processes
+    return key if isinstance(key, str) else json.dumps(key)
+
+
+class MemoryBackend:
+    """State private to this process (the default)"""
+
+    name = "memory"
+    shared = False
+
+    def cache(self, namespace: str, max_entries: int, max_bytes: int, ttl: float) -> TTLCache:
+        return TTLCache(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+
+    def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "shared": self.shared}
+
+
+class SharedCache:
+    """
+    TTLCache's interface over a namespace of the shared store. Bounds are
+    enforced by periodic pruning (oldest written first) rather than on every
+    set, and hit/miss counts are this process's own.
+    """
+
+    def __init__(self, backend: "SQLiteBackend", namespace: str,
+                 max_entries: int, max_bytes: int, ttl: float):
+        self.backend = backend
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._writes = 0
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        try:
+            row = self.backend.read(
+                "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?",
+                (self.namespace, _encode_key(key)),
+            )
+        except sqlite3.Error as e:
+            record_error("state", e)
+            row = None
+        if row is None or row[1] <= time.time():
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        encoded = json.dumps(value, default=str)
+        size = len(encoded)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        self.backend.write(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+            (self.namespace, _encode_key(key), encoded, size, now + (ttl or self.ttl), now),
+        )
+        self._writes += 1
+        if self._writes % STATE_PRUNE_EVERY == 0:
+            self.backend.submit(self._prune)
+
+    def pop(self, key: Hashable):
+        self.backend.write(
+            "DELETE FROM entries WHERE namespace = ? AND key = ?",
+            (self.namespace, _encode_key(key)),
+        )
+
+    def clear(self):
+        self.backend.write("DELETE FROM entries WHERE namespace = ?", (self.namespace,))
+
+    def _prune(self, db: sqlite3.Connection):
+        """Drop expired entries, then the oldest until within both budgets (writer thread)"""
+        with db:
+            expired = db.execute(
+                "DELETE FROM entries WHERE namespace = ? AND expires_at <= ?",
+                (self.namespace, time.time()),
+            ).rowcount
+            evicted = db.execute(
+                """
+                DELETE FROM entries WHERE namespace = ? AND key IN (
+                    SELECT key FROM (
+                        SELECT key,
+                               ROW_NUMBER() OVER (ORDER BY updated_at DESC) AS n,
+                               SUM(size) OVER (ORDER BY updated_at DESC) AS running
+                        FROM entries WHERE namespace = ?
+                    ) WHERE n > ? OR running > ?
+                )
+                """,
+                (self.namespace, self.namespace, self.max_entries, self.max_bytes),
+            ).rowcount
+        self.expirations += expired
+        self.evictions += evicted
+
+    def _totals(self) -> tuple:
+        try:
+            return self.backend.read(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+                " WHERE namespace = ? AND expires_at > ?",
+                (self.namespace, time.time()),
+            )
+        except sqlite3.Error:
+            return 0, 0
+
+    def __len__(self) -> int:
+        return self._totals()[0]
+
+    def stats(self) -> dict:
+        entries, size = self._totals()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SharedLog:
+    """
+    Per-key append-only lists in the shared store, for state that several
+    workers add to at once (session turns). Each append is its own row with
+    the next sequence number, so concurrent appends never overwrite each
+    other. A key keeps its newest `max_items` items and expires `ttl` seconds
+    after its last append; past `max_keys`, the least recently appended keys
+    are pruned.
+    """
+
+    def __init__(self, backend: "SQLiteBackend", namespace: str,
+                 max_keys: int, max_items: int, ttl: float):
+        self.backend = backend
+        self.namespace = namespace
+        self.max_keys = max_keys
+        self.max_items = max_items
+        self.ttl = ttl
+        self._appends = 0
+
+    def append(self, key: str, value: Any):
+        encoded = json.dumps(value, default=str)
+        namespace = self.namespace
+        expires_at = time.time() + self.ttl
+
+        def run(db: sqlite3.Connection):
+            # One transaction: SQLite's write lock makes MAX(seq) + 1 unique
+            with db:
+                db.execute(
+                    "INSERT INTO logs SELECT ?, ?, COALESCE(MAX(seq), 0) + 1, ?, ? FROM logs"
+                    " WHERE namespace = ? AND key = ?",
+                    (namespace, key, encoded, expires_at, namespace, key),
+                )
+                db.execute(
+                    "DELETE FROM logs WHERE namespace = ? AND key = ? AND seq <="
+                    " (SELECT MAX(seq) FROM logs WHERE namespace = ? AND key = ?) - ?",
+                    (namespace, key, namespace, key, self.max_items),
+                )
+                db.execute(
+                    "UPDATE logs SET expires_at = ? WHERE namespace = ? AND key = ?",
+                    (expires_at, namespace, key),
+                )
+            self.backend.writes += 1
+
+        self.backend.submit(run)
+        self._appends += 1
+        if self._appends % STATE_PRUNE_EVERY == 0:
+            self.backend.submit(self._prune)
+
+    def items(self, key: str) -> list:
+        """The key's live items, oldest first"""
+        try:
+            rows = self.backend.read_all(
+                "SELECT value FROM logs WHERE namespace = ? AND key = ? AND expires_at > ?"
+                " ORDER BY seq",
+                (self.namespace, key, time.time()),
+            )
+        except sqlite3.Error as e:
+            record_error("state", e)
+            return []
+        return [json.loads(value) for (value,) in rows]
+
+    def _prune(self, db: sqlite3.Connection):
+        """Drop expired keys, then the least recently appended past max_keys (writer thread)"""
+        with db:
+            db.execute(
+                "DELETE FROM logs WHERE namespace = ? AND expires_at <= ?",
+                (self.namespace, time.time()),
+            )
+            db.execute(
+                """
+                DELETE FROM logs WHERE namespace = ? AND key IN (
+                    SELECT key FROM (
+                        SELECT key, ROW_NUMBER() OVER (ORDER BY MAX(expires_at) DESC) AS n
+                        FROM logs WHERE namespace = ? GROUP BY key
+                    ) WHERE n > ?
+                )
+                """,
+                (self.namespace, self.namespace, self.max_keys),
+            )
+
+    def __len__(self) -> int:
+        try:
+            return self.backend.read(
+                "SELECT COUNT(DISTINCT key) FROM logs WHERE namespace = ? AND expires_at > ?",
+                (self.namespace, time.time()),
+            )[0]
+        except sqlite3.Error:
+            return 0
+
+
+class SQLiteBackend:
+    """State in one SQLite (WAL) file shared by every worker that opens it"""
+
+    name = "sqlite"
+    shared = True
+
+    def __init__(self, path: str):
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # Connections are opened on first use, so a supervisor process that
+        # only imports the app never holds the file open
+        self._reader: Optional[sqlite3.Connection] = None
+        self._writer: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state")
+        self._lock = threading.Lock()
+        self.writes = 0
+        self.write_errors = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(SCHEMA)
+        return db
+
+    def read(self, sql: str, params: tuple) -> Optional[tuple]:
+        with self._lock:
+            if self._reader is None:
+                self._reader = self._connect()
+            return self._reader.execute(sql, params).fetchone()
+
+    def read_all(self, sql: str, params: tuple) -> list:
+        with self._lock:
+            if self._reader is None:
+                self._reader = self._connect()
+            return self._reader.execute(sql, params).fetchall()
+
+    def submit(self, fn):
+        """Run fn(db) on the writer thread"""
+        def run():
+            if self._writer is None:
+                self._writer = self._connect()
+            try:
+                fn(self._writer)
+            except sqlite3.Error as e:
+                self.write_errors += 1
+                record_error("state", e)
+                print(f"State write error: {e}")
+
+        self._executor.submit(run)
+
+    def write(self, sql: str, params: tuple):
+        def run(db: sqlite3.Connection):
+            with db:
+                db.execute(sql, params)
+            self.writes += 1
+
+        self.submit(run)
+
+    def cache(self, namespace: str, max_entries: int, max_bytes: int, ttl: float) -> SharedCache:
+        return SharedCache(self, namespace, max_entries, max_bytes, ttl)
+
+    def log(self, namespace: str, max_keys: int, max_items: int, ttl: float) -> SharedLog:
+        return SharedLog(self, namespace, max_keys, max_items, ttl)
+
+    def close(self):
+        """Finish queued writes and close both connections (reopened if used again)"""
+        def close_writer():
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+        self._executor.submit(close_writer).result()
+        with self._lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "shared": self.shared,
+            "path": self.path,
+            "writes": self.writes,
+            "write_errors": self.write_errors,
+        }
+
+
+_backend = None
+
+
+def get_state():
+    """The configured backend, created on first use"""
+    global _backend
+    if _backend is None:
+        if STATE_BACKEND == "sqlite":
+            _backend = SQLiteBackend(STATE_PATH)
+        elif STATE_BACKEND == "memory":
+            _backend = MemoryBackend()
+        else:
+            raise ValueError(f"STATE_BACKEND must be 'memory' or 'sqlite', not {STATE_BACKEND!r}")
+    return _backend
+
+
+def close_state():
+    if _backend is not None:
+        _backend.close()
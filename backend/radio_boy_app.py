@@ -3,14 +3,15 @@
 Radio Boy - Apple Music-style chat interface
 Uses OpenAI for music recommendations and Deezer for 30-second previews
 """
+import csv
+import io
 import os
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 from pathlib import Path
-import httpx
-from typing import Optional
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from openai import OpenAI
 from dotenv import load_dotenv
 import uvicorn
 import json
@@ -18,7 +19,45 @@ from fastapi.middleware.cors import CORSMiddleware
 
 load_dotenv()
 
-app = FastAPI()
+from radio_boy.assets import CONTENT_TYPES, AssetBundle, Payload, json_response
+from radio_boy.catalog import TRACK_CATALOG_WARM, close_catalog, get_catalog, start_catalog
+from radio_boy.covers import album_cache, cover_response, get_cover_cache
+from radio_boy.deezer import deezer_flights, track_cache, warm_track_cache
+from radio_boy.emails import close_email_store, get_email_store, start_email_store
+from radio_boy.http_pool import close_pool, get_pool
+from radio_boy.llm import LLMClient
+from radio_boy.media import MediaManifest
+from radio_boy.metrics import CallbackMetric, MetricsMiddleware, record_error, render
+from radio_boy.pipeline import parse_stats, reply_cache, reply_events, reply_flights, start_turn
+from radio_boy.previews import get_preview_cache, preview_response
+from radio_boy.sessions import new_session_id, sessions
+from radio_boy.state import STATE_BACKEND, close_state, get_state
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Own the process-wide upstream clients"""
+    app.state.llm = LLMClient()
+    get_pool()
+    catalog = await start_catalog()
+    state = get_state()
+    emails = await start_email_store(shared=state.shared)
+    print(f"Email store ready with {emails.count()} addresses ({state.name} state backend)")
+    # A shared track cache outlives restarts and is filled by every worker,
+    # so only a private one is warmed
+    if catalog is not None and TRACK_CATALOG_WARM and not state.shared:
+        print(f"Warmed track cache with {await warm_track_cache(catalog)} catalog tracks")
+    yield
+    await app.state.llm.close()
+    await close_pool()
+    await close_catalog()
+    await close_email_store()
+    close_state()
+
+
+app = FastAPI(lifespan=lifespan)
+
+app.add_middleware(MetricsMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -31,94 +70,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-client = OpenAI()
-
-# Store collected emails (in production, use a database)
-collected_emails = []
+EMAILS_PAGE_SIZE = int(os.getenv("EMAILS_PAGE_SIZE", "100"))
+EMAILS_MAX_PAGE_SIZE = 1000
 
 # Serve static files (video, etc.) - only mount if directory exists
 STATIC_DIR = Path(__file__).resolve().parent / "public"
 if STATIC_DIR.exists():
     app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="public")
 
-# System prompt for Radio Boy
-SYSTEM_PROMPT = """You are Radio Boy, a cool and knowledgeable music curator, songwriting assistant, and creative workflow manager with the vibe of a late-night radio DJ meets studio producer.
-
-You have THREE core capabilities:
-
-## 1. MUSIC DISCOVERY
-When users describe a vibe, mood, or ask for music recommendations:
-- Give a brief, enthusiastic comment (1-2 sentences)
-- Recommend 2-3 specific songs that match
-
-## 2. SONGWRITING ASSISTANCE
-When users share rough ideas, melodies, or want help with songwriting:
-- Turn rough ideas into lyrics concepts
-- Create hooks, ad-libs, and catchy phrases
-- Suggest song structure (verse, chorus, bridge, outro)
-- Provide reference tracks for inspiration
-- Help with rhyme schemes and flow
-
-## 3. WORKFLOW MANAGEMENT
-When users need help organizing their creative process:
-- Create and manage session notes
-- Build to-do lists for their project
-- Track versions of their work
-- Provide release checklists
-- Set milestones and deadlines
-
-IMPORTANT: Always respond with valid JSON in this exact format:
-{
-    "message": "Your response here - can be longer for songwriting/workflow tasks",
-    "tracks": [
-        {"artist": "Artist Name", "title": "Song Title"}
-    ],
-    "lyrics": {
-        "hook": "The catchy hook line if applicable",
-        "verse": "Verse lyrics if applicable",
-        "structure": "Song structure suggestion if applicable",
-        "adlibs": ["ad-lib 1", "ad-lib 2"]
-    },
-    "workflow": {
-        "type": "note|todo|checklist|version",
-        "title": "Title of the item",
-        "items": ["item 1", "item 2", "item 3"]
-    }
-}
-
-Rules:
-- Only include "tracks" array if recommending music (otherwise empty array)
-- Only include "lyrics" object if helping with songwriting (otherwise null)
-- Only include "workflow" object if managing workflow (otherwise null)
-- Keep your vibe cool and creative, like a producer in the studio
-- Use music industry slang naturally
-- Be encouraging and collaborative"""
-
-
-async def search_deezer(artist: str, title: str) -> Optional[dict]:
-    """Search Deezer for a track and return preview URL"""
-    query = f"{artist} {title}"
-    async with httpx.AsyncClient() as http_client:
-        try:
-            response = await http_client.get(
-                "https://api.deezer.com/search",
-                params={"q": query, "limit": 1}
-            )
-            data = response.json()
-            if data.get("data") and len(data["data"]) > 0:
-                track = data["data"][0]
-                return {
-                    "id": track["id"],
-                    "title": track["title"],
-                    "artist": track["artist"]["name"],
-                    "album": track["album"]["title"],
-                    "cover": track["album"]["cover_medium"],
-                    "preview": track["preview"]  # 30-second preview URL
-                }
-        except Exception as e:
-            print(f"Deezer search error: {e}")
-    return None
-
 
 # The Apple Music-style HTML template with email gateway
 HTML_TEMPLATE = """
@@ -128,673 +87,7 @@ HTML_TEMPLATE = """
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Radio Boy</title>
-    <style>
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }
-
-        body {
-            background: #000;
-            min-height: 100vh;
-            display: flex;
-            justify-content: center;
-            align-items: center;
-            padding: 20px;
-            font-family: -apple-system, BlinkMacSystemFont, 'SF Pro Display', 'Segoe UI', Roboto, Helvetica, Arial, sans-serif;
-        }
-
-        /* Email Gateway Overlay */
-        .gateway-overlay {
-            position: fixed;
-            top: 0;
-            left: 0;
-            right: 0;
-            bottom: 0;
-            background: rgba(0, 0, 0, 0.95);
-            display: flex;
-            z-index: 1000;
-        }
-
-        .gateway-overlay.hidden {
-            display: none;
-        }
-
-        .gateway-left {
-            width: 400px;
-            background: #1c1c1e;
-            padding: 40px;
-            display: flex;
-            flex-direction: column;
-            justify-content: center;
-            border-right: 1px solid #3a3a3c;
-        }
-
-        .gateway-right {
-            flex: 1;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            padding: 40px;
-        }
-
-        .gateway-right video {
-            max-width: 400px;
-            max-height: 400px;
-            border-radius: 24px;
-            box-shadow: 0 20px 60px rgba(255, 45, 85, 0.3);
-        }
-
-        .gateway-logo {
-            font-size: 32px;
-            font-weight: 700;
-            color: #fff;
-            margin-bottom: 8px;
-        }
-
-        .gateway-tagline {
-            font-size: 16px;
-            color: #ff2d55;
-            margin-bottom: 40px;
-        }
-
-        .gateway-title {
-            font-size: 24px;
-            font-weight: 600;
-            color: #fff;
-            margin-bottom: 8px;
-        }
-
-        .gateway-subtitle {
-            font-size: 14px;
-            color: #8e8e93;
-            margin-bottom: 24px;
-        }
-
-        .google-btn {
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            gap: 12px;
-            width: 100%;
-            padding: 14px 20px;
-            background: #fff;
-            border: none;
-            border-radius: 12px;
-            font-size: 15px;
-            font-weight: 600;
-            color: #1c1c1e;
-            cursor: pointer;
-            transition: background 0.2s;
-            margin-bottom: 20px;
-        }
-
-        .google-btn:hover {
-            background: #f0f0f0;
-        }
-
-        .google-btn svg {
-            width: 20px;
-            height: 20px;
-        }
-
-        .divider {
-            display: flex;
-            align-items: center;
-            margin: 20px 0;
-        }
-
-        .divider::before,
-        .divider::after {
-            content: '';
-            flex: 1;
-            height: 1px;
-            background: #3a3a3c;
-        }
-
-        .divider span {
-            padding: 0 16px;
-            color: #8e8e93;
-            font-size: 13px;
-        }
-
-        .email-input {
-            width: 100%;
-            padding: 14px 16px;
-            background: #2c2c2e;
-            border: 1px solid #3a3a3c;
-            border-radius: 12px;
-            font-size: 15px;
-            color: #fff;
-            outline: none;
-            margin-bottom: 16px;
-        }
-
-        .email-input::placeholder {
-            color: #8e8e93;
-        }
-
-        .email-input:focus {
-            border-color: #ff2d55;
-        }
-
-        .continue-btn {
-            width: 100%;
-            padding: 14px 20px;
-            background: #ff2d55;
-            border: none;
-            border-radius: 12px;
-            font-size: 15px;
-            font-weight: 600;
-            color: #fff;
-            cursor: pointer;
-            transition: background 0.2s;
-        }
-
-        .continue-btn:hover {
-            background: #ff375f;
-        }
-
-        .continue-btn:disabled {
-            background: #3a3a3c;
-            cursor: not-allowed;
-        }
-
-        .gateway-footer {
-            margin-top: 24px;
-            font-size: 12px;
-            color: #8e8e93;
-            text-align: center;
-        }
-
-        .gateway-footer a {
-            color: #ff2d55;
-            text-decoration: none;
-        }
-
-        .email-error {
-            color: #ff453a;
-            font-size: 13px;
-            margin-bottom: 12px;
-            display: none;
-        }
-
-        .email-error.show {
-            display: block;
-        }
-
-        /* Main App Card */
-        .card {
-            background: #1c1c1e;
-            border-radius: 24px;
-            overflow: hidden;
-            border: 1px solid #3a3a3c;
-            box-shadow: 0 20px 40px rgba(0,0,0,0.45);
-            width: 100%;
-            max-width: 420px;
-            color: #fff;
-        }
-
-        .video-container {
-            width: 100%;
-            aspect-ratio: 1/1;
-            background: #000;
-            position: relative;
-        }
-
-        .video-container video {
-            width: 100%;
-            height: 100%;
-            object-fit: cover;
-            display: block;
-        }
-
-        .now-playing {
-            position: absolute;
-            bottom: 0;
-            left: 0;
-            right: 0;
-            background: linear-gradient(transparent, rgba(0,0,0,0.9));
-            padding: 40px 16px 16px;
-            display: none;
-        }
-
-        .now-playing.active {
-            display: block;
-        }
-
-        .now-playing-content {
-            display: flex;
-            align-items: center;
-            gap: 12px;
-        }
-
-        .now-playing-cover {
-            width: 48px;
-            height: 48px;
-            border-radius: 6px;
-            object-fit: cover;
-        }
-
-        .now-playing-info {
-            flex: 1;
-            min-width: 0;
-        }
-
-        .now-playing-title {
-            font-size: 14px;
-            font-weight: 600;
-            white-space: nowrap;
-            overflow: hidden;
-            text-overflow: ellipsis;
-        }
-
-        .now-playing-artist {
-            font-size: 12px;
-            color: #ff2d55;
-        }
-
-        .content {
-            padding: 20px;
-        }
-
-        .header-row {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            margin-bottom: 4px;
-        }
-
-        .title {
-            font-size: 22px;
-            font-weight: 700;
-            color: #ffffff;
-        }
-
-        .user-email {
-            font-size: 12px;
-            color: #8e8e93;
-            background: #2c2c2e;
-            padding: 4px 10px;
-            border-radius: 12px;
-        }
-
-        .user-section {
-            display: flex;
-            align-items: center;
-            gap: 8px;
-        }
-
-        .signout-btn {
-            font-size: 11px;
-            color: #ff453a;
-            background: transparent;
-            border: 1px solid #ff453a;
-            padding: 4px 10px;
-            border-radius: 12px;
-            cursor: pointer;
-            transition: all 0.2s;
-        }
-
-        .signout-btn:hover {
-            background: #ff453a;
-            color: #fff;
-        }
-
-        .subtitle {
-            font-size: 14px;
-            color: #ff2d55;
-            margin-bottom: 14px;
-        }
-
-        .conversation {
-            font-size: 15px;
-            line-height: 1.6;
-            color: #d1d1d6;
-            max-height: 300px;
-            overflow-y: auto;
-            margin-bottom: 16px;
-        }
-
-        .conversation::-webkit-scrollbar {
-            width: 6px;
-        }
-
-        .conversation::-webkit-scrollbar-track {
-            background: #1c1c1e;
-        }
-
-        .conversation::-webkit-scrollbar-thumb {
-            background: #3a3a3c;
-            border-radius: 3px;
-        }
-
-        .message {
-            margin-bottom: 12px;
-        }
-
-        .message.user .speaker {
-            color: #ff2d55;
-            font-weight: 600;
-        }
-
-        .message.assistant .speaker {
-            color: #ffffff;
-            font-weight: 600;
-        }
-
-        .message .text {
-            color: #d1d1d6;
-        }
-
-        .tracks {
-            display: flex;
-            flex-direction: column;
-            gap: 8px;
-            margin-top: 10px;
-        }
-
-        .track-card {
-            display: flex;
-            align-items: center;
-            gap: 10px;
-            background: #2c2c2e;
-            border-radius: 10px;
-            padding: 10px;
-            cursor: pointer;
-            transition: background 0.2s;
-        }
-
-        .track-card:hover {
-            background: #3a3a3c;
-        }
-
-        .track-card.playing {
-            background: #ff2d55;
-        }
-
-        .track-cover {
-            width: 44px;
-            height: 44px;
-            border-radius: 6px;
-            object-fit: cover;
-        }
-
-        .track-info {
-            flex: 1;
-            min-width: 0;
-        }
-
-        .track-title {
-            font-size: 14px;
-            font-weight: 600;
-            white-space: nowrap;
-            overflow: hidden;
-            text-overflow: ellipsis;
-        }
-
-        .track-artist {
-            font-size: 12px;
-            color: #8e8e93;
-        }
-
-        .track-card.playing .track-artist {
-            color: rgba(255,255,255,0.8);
-        }
-
-        .play-btn {
-            width: 32px;
-            height: 32px;
-            border-radius: 50%;
-            background: #ff2d55;
-            border: none;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            cursor: pointer;
-            flex-shrink: 0;
-        }
-
-        .track-card.playing .play-btn {
-            background: #fff;
-        }
-
-        .play-btn svg {
-            width: 14px;
-            height: 14px;
-            fill: #fff;
-        }
-
-        .track-card.playing .play-btn svg {
-            fill: #ff2d55;
-        }
-
-        .input-container {
-            display: flex;
-            gap: 10px;
-        }
-
-        .input-container input {
-            flex: 1;
-            background: #2c2c2e;
-            border: 1px solid #3a3a3c;
-            border-radius: 12px;
-            padding: 12px 16px;
-            color: #fff;
-            font-size: 15px;
-            outline: none;
-            font-family: inherit;
-        }
-
-        .input-container input::placeholder {
-            color: #8e8e93;
-        }
-
-        .input-container input:focus {
-            border-color: #ff2d55;
-        }
-
-        .input-container button {
-            background: #ff2d55;
-            border: none;
-            border-radius: 12px;
-            padding: 12px 20px;
-            color: #fff;
-            font-size: 15px;
-            font-weight: 600;
-            cursor: pointer;
-            font-family: inherit;
-            transition: background 0.2s;
-        }
-
-        .input-container button:hover {
-            background: #ff375f;
-        }
-
-        .input-container button:disabled {
-            background: #3a3a3c;
-            cursor: not-allowed;
-        }
-
-        .empty-state {
-            color: #8e8e93;
-            font-style: italic;
-        }
-
-        /* Lyrics Section */
-        .lyrics-section {
-            background: linear-gradient(135deg, #2c2c2e 0%, #1c1c1e 100%);
-            border: 1px solid #3a3a3c;
-            border-radius: 12px;
-            padding: 14px;
-            margin-top: 10px;
-        }
-
-        .lyrics-header {
-            display: flex;
-            align-items: center;
-            gap: 8px;
-            margin-bottom: 10px;
-            font-size: 13px;
-            color: #ff2d55;
-            font-weight: 600;
-            text-transform: uppercase;
-            letter-spacing: 0.5px;
-        }
-
-        .lyrics-header svg {
-            width: 16px;
-            height: 16px;
-            fill: #ff2d55;
-        }
-
-        .lyrics-part {
-            margin-bottom: 12px;
-        }
-
-        .lyrics-label {
-            font-size: 11px;
-            color: #8e8e93;
-            text-transform: uppercase;
-            letter-spacing: 0.5px;
-            margin-bottom: 4px;
-        }
-
-        .lyrics-content {
-            font-size: 14px;
-            color: #fff;
-            line-height: 1.5;
-            font-style: italic;
-        }
-
-        .lyrics-hook {
-            font-size: 16px;
-            font-weight: 600;
-            color: #ff2d55;
-            font-style: normal;
-        }
-
-        .adlibs {
-            display: flex;
-            flex-wrap: wrap;
-            gap: 6px;
-        }
-
-        .adlib-tag {
-            background: #ff2d55;
-            color: #fff;
-            padding: 4px 10px;
-            border-radius: 12px;
-            font-size: 12px;
-            font-weight: 500;
-        }
-
-        /* Workflow Section */
-        .workflow-section {
-            background: linear-gradient(135deg, #1a2f1a 0%, #1c1c1e 100%);
-            border: 1px solid #2d4a2d;
-            border-radius: 12px;
-            padding: 14px;
-            margin-top: 10px;
-        }
-
-        .workflow-header {
-            display: flex;
-            align-items: center;
-            gap: 8px;
-            margin-bottom: 10px;
-            font-size: 13px;
-            color: #30d158;
-            font-weight: 600;
-            text-transform: uppercase;
-            letter-spacing: 0.5px;
-        }
-
-        .workflow-header svg {
-            width: 16px;
-            height: 16px;
-            fill: #30d158;
-        }
-
-        .workflow-title {
-            font-size: 15px;
-            font-weight: 600;
-            color: #fff;
-            margin-bottom: 10px;
-        }
-
-        .workflow-items {
-            list-style: none;
-        }
-
-        .workflow-item {
-            display: flex;
-            align-items: flex-start;
-            gap: 10px;
-            padding: 8px 0;
-            border-bottom: 1px solid #2d4a2d;
-            font-size: 14px;
-            color: #d1d1d6;
-        }
-
-        .workflow-item:last-child {
-            border-bottom: none;
-        }
-
-        .workflow-checkbox {
-            width: 18px;
-            height: 18px;
-            border: 2px solid #30d158;
-            border-radius: 4px;
-            flex-shrink: 0;
-            margin-top: 2px;
-        }
-
-        .workflow-number {
-            width: 22px;
-            height: 22px;
-            background: #30d158;
-            color: #000;
-            border-radius: 50%;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            font-size: 12px;
-            font-weight: 600;
-            flex-shrink: 0;
-        }
-
-        .loading {
-            display: inline-block;
-            width: 16px;
-            height: 16px;
-            border: 2px solid #3a3a3c;
-            border-top-color: #ff2d55;
-            border-radius: 50%;
-            animation: spin 0.8s linear infinite;
-            margin-left: 8px;
-            vertical-align: middle;
-        }
-
-        @keyframes spin {
-            to { transform: rotate(360deg); }
-        }
-
-        @media (max-width: 800px) {
-            .gateway-overlay {
-                flex-direction: column;
-            }
-            .gateway-left {
-                width: 100%;
-                border-right: none;
-                border-bottom: 1px solid #3a3a3c;
-            }
-            .gateway-right {
-                display: none;
-            }
-        }
-    </style>
+    <link rel="stylesheet" href="__APP_CSS__">
 </head>
 <body>
     <!-- Email Gateway Overlay -->
@@ -828,14 +121,14 @@ HTML_TEMPLATE = """
             </div>
         </div>
         <div class="gateway-right">
-            <video src="/static/animation.mp4" autoplay loop muted playsinline></video>
+            <video src="__ANIMATION_MP4__" autoplay loop muted playsinline></video>
         </div>
     </div>
 
     <!-- Main App Card -->
     <div class="card">
         <div class="video-container">
-            <video src="/static/animation.mp4" autoplay loop muted playsinline></video>
+            <video src="__ANIMATION_MP4__" autoplay loop muted playsinline></video>
             <div class="now-playing" id="nowPlaying">
                 <div class="now-playing-content">
                     <img class="now-playing-cover" id="npCover" src="" alt="">
@@ -870,346 +163,232 @@ HTML_TEMPLATE = """
 
     <audio id="audioPlayer"></audio>
 
-    <script>
-        const gateway = document.getElementById('gateway');
-        const emailInput = document.getElementById('emailInput');
-        const emailError = document.getElementById('emailError');
-        const conversationEl = document.getElementById('conversation');
-        const inputEl = document.getElementById('input');
-        const sendBtn = document.getElementById('send');
-        const audioPlayer = document.getElementById('audioPlayer');
-        const nowPlaying = document.getElementById('nowPlaying');
-        const userEmailDisplay = document.getElementById('userEmailDisplay');
-
-        let userEmail = localStorage.getItem('radioboy_email');
-        let history = [];
-        let currentlyPlaying = null;
-
-        const playIcon = '<svg viewBox="0 0 24 24"><path d="M8 5v14l11-7z"/></svg>';
-        const pauseIcon = '<svg viewBox="0 0 24 24"><rect x="6" y="4" width="4" height="16"/><rect x="14" y="4" width="4" height="16"/></svg>';
-
-        // Check if user already logged in
-        if (userEmail) {
-            gateway.classList.add('hidden');
-            userEmailDisplay.textContent = userEmail;
-            document.getElementById('signoutBtn').style.display = 'inline-block';
-            inputEl.focus();
-        } else {
-            document.getElementById('signoutBtn').style.display = 'none';
-        }
-
-        function validateEmail(email) {
-            const re = /^[^\s@]+@[^\s@]+\.[^\s@]+$/;
-            return re.test(email);
-        }
-
-        function signInWithGoogle() {
-            // For demo, prompt for email (in production, use real Google OAuth)
-            const email = prompt('Enter your Google email:');
-            if (email && validateEmail(email)) {
-                saveEmail(email);
-            }
-        }
-
-        function submitEmail() {
-            const email = emailInput.value.trim();
-            if (!validateEmail(email)) {
-                emailError.classList.add('show');
-                return;
-            }
-            emailError.classList.remove('show');
-            saveEmail(email);
-        }
-
-        async function saveEmail(email) {
-            userEmail = email;
-            localStorage.setItem('radioboy_email', email);
-
-            // Send to backend
-            try {
-                await fetch('/collect-email', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ email: email })
-                });
-            } catch (e) {
-                console.error('Failed to save email:', e);
-            }
-
-            gateway.classList.add('hidden');
-            userEmailDisplay.textContent = email;
-            document.getElementById('signoutBtn').style.display = 'inline-block';
-            inputEl.focus();
-        }
-
-        function signOut() {
-            // Clear localStorage
-            localStorage.removeItem('radioboy_email');
-            userEmail = null;
-
-            // Clear conversation history
-            history = [];
-            renderConversation();
-
-            // Stop any playing audio
-            audioPlayer.pause();
-            currentlyPlaying = null;
-            nowPlaying.classList.remove('active');
-
-            // Hide user email and sign out button
-            userEmailDisplay.textContent = '';
-            document.getElementById('signoutBtn').style.display = 'none';
-
-            // Show the gateway overlay
-            gateway.classList.remove('hidden');
-        }
-
-        // Allow Enter key on email input
-        emailInput.addEventListener('keypress', (e) => {
-            if (e.key === 'Enter') submitEmail();
-        });
-
-        const micIcon = '<svg viewBox="0 0 24 24"><path d="M12 14c1.66 0 3-1.34 3-3V5c0-1.66-1.34-3-3-3S9 3.34 9 5v6c0 1.66 1.34 3 3 3z"/><path d="M17 11c0 2.76-2.24 5-5 5s-5-2.24-5-5H5c0 3.53 2.61 6.43 6 6.92V21h2v-3.08c3.39-.49 6-3.39 6-6.92h-2z"/></svg>';
-        const checklistIcon = '<svg viewBox="0 0 24 24"><path d="M19 3H5c-1.1 0-2 .9-2 2v14c0 1.1.9 2 2 2h14c1.1 0 2-.9 2-2V5c0-1.1-.9-2-2-2zm-9 14l-5-5 1.41-1.41L10 14.17l7.59-7.59L19 8l-9 9z"/></svg>';
-
-        function renderConversation() {
-            if (history.length === 0) {
-                conversationEl.innerHTML = '<div class="empty-state">Tell me your vibe, share song ideas, or ask me to help manage your creative workflow.</div>';
-                return;
-            }
-
-            conversationEl.innerHTML = history.map((msg, idx) => {
-                let tracksHtml = '';
-                let lyricsHtml = '';
-                let workflowHtml = '';
-
-                // Render tracks
-                if (msg.tracks && msg.tracks.length > 0) {
-                    tracksHtml = '<div class="tracks">' + msg.tracks.map((track, trackIdx) => {
-                        const safeTitle = track.title.replace(/'/g, "&#39;");
-                        const safeArtist = track.artist.replace(/'/g, "&#39;");
-                        return '<div class="track-card" data-preview="' + track.preview + '" data-title="' + safeTitle + '" data-artist="' + safeArtist + '" data-cover="' + track.cover + '" onclick="playTrack(this)">' +
-                            '<img class="track-cover" src="' + track.cover + '" alt="">' +
-                            '<div class="track-info">' +
-                                '<div class="track-title">' + track.title + '</div>' +
-                                '<div class="track-artist">' + track.artist + '</div>' +
-                            '</div>' +
-                            '<button class="play-btn">' + playIcon + '</button>' +
-                        '</div>';
-                    }).join('') + '</div>';
-                }
-
-                // Render lyrics
-                if (msg.lyrics) {
-                    let lyricsParts = '';
-                    if (msg.lyrics.hook) {
-                        lyricsParts += '<div class="lyrics-part"><div class="lyrics-label">Hook</div><div class="lyrics-content lyrics-hook">' + msg.lyrics.hook + '</div></div>';
-                    }
-                    if (msg.lyrics.verse) {
-                        lyricsParts += '<div class="lyrics-part"><div class="lyrics-label">Verse</div><div class="lyrics-content">' + msg.lyrics.verse.replace(/\\n/g, '<br>') + '</div></div>';
-                    }
-                    if (msg.lyrics.structure) {
-                        lyricsParts += '<div class="lyrics-part"><div class="lyrics-label">Structure</div><div class="lyrics-content">' + msg.lyrics.structure + '</div></div>';
-                    }
-                    if (msg.lyrics.adlibs && msg.lyrics.adlibs.length > 0) {
-                        lyricsParts += '<div class="lyrics-part"><div class="lyrics-label">Ad-libs</div><div class="adlibs">' +
-                            msg.lyrics.adlibs.map(a => '<span class="adlib-tag">' + a + '</span>').join('') + '</div></div>';
-                    }
-                    if (lyricsParts) {
-                        lyricsHtml = '<div class="lyrics-section"><div class="lyrics-header">' + micIcon + ' Songwriting</div>' + lyricsParts + '</div>';
-                    }
-                }
-
-                // Render workflow
-                if (msg.workflow && msg.workflow.items && msg.workflow.items.length > 0) {
-                    const isChecklist = msg.workflow.type === 'todo' || msg.workflow.type === 'checklist';
-                    const itemsHtml = msg.workflow.items.map((item, i) => {
-                        const indicator = isChecklist ?
-                            '<div class="workflow-checkbox"></div>' :
-                            '<div class="workflow-number">' + (i + 1) + '</div>';
-                        return '<div class="workflow-item">' + indicator + '<span>' + item + '</span></div>';
-                    }).join('');
-                    workflowHtml = '<div class="workflow-section"><div class="workflow-header">' + checklistIcon + ' ' + (msg.workflow.type || 'Workflow') + '</div>' +
-                        '<div class="workflow-title">' + (msg.workflow.title || '') + '</div>' +
-                        '<div class="workflow-items">' + itemsHtml + '</div></div>';
-                }
-
-                return '<div class="message ' + msg.role + '">' +
-                    '<span class="speaker">' + (msg.role === 'user' ? 'You' : 'Radio Boy') + ':</span>' +
-                    '<span class="text"> ' + msg.text + '</span>' +
-                    tracksHtml + lyricsHtml + workflowHtml +
-                '</div>';
-            }).join('');
-
-            conversationEl.scrollTop = conversationEl.scrollHeight;
-        }
-
-        function playTrack(element) {
-            const preview = element.dataset.preview;
-            const title = element.dataset.title;
-            const artist = element.dataset.artist;
-            const cover = element.dataset.cover;
-
-            document.querySelectorAll('.track-card').forEach(el => {
-                el.classList.remove('playing');
-                el.querySelector('.play-btn').innerHTML = playIcon;
-            });
-
-            if (currentlyPlaying === preview && !audioPlayer.paused) {
-                audioPlayer.pause();
-                currentlyPlaying = null;
-                nowPlaying.classList.remove('active');
-            } else {
-                audioPlayer.src = preview;
-                audioPlayer.play();
-                currentlyPlaying = preview;
-                element.classList.add('playing');
-                element.querySelector('.play-btn').innerHTML = pauseIcon;
-
-                document.getElementById('npCover').src = cover;
-                document.getElementById('npTitle').textContent = title;
-                document.getElementById('npArtist').textContent = artist;
-                nowPlaying.classList.add('active');
-            }
-        }
-
-        audioPlayer.addEventListener('ended', () => {
-            document.querySelectorAll('.track-card').forEach(el => {
-                el.classList.remove('playing');
-                el.querySelector('.play-btn').innerHTML = playIcon;
-            });
-            currentlyPlaying = null;
-            nowPlaying.classList.remove('active');
-        });
-
-        async function sendMessage() {
-            const text = inputEl.value.trim();
-            if (!text) return;
-
-            inputEl.disabled = true;
-            sendBtn.disabled = true;
-
-            history.push({ role: 'user', text: text, tracks: [] });
-            renderConversation();
-            inputEl.value = '';
-
-            conversationEl.innerHTML += '<div class="message assistant"><span class="speaker">Radio Boy:</span><span class="loading"></span></div>';
-            conversationEl.scrollTop = conversationEl.scrollHeight;
-
-            try {
-                const response = await fetch('/chat', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ message: text, email: userEmail })
-                });
-
-                const data = await response.json();
-                history.push({
-                    role: 'assistant',
-                    text: data.message,
-                    tracks: data.tracks || [],
-                    lyrics: data.lyrics || null,
-                    workflow: data.workflow || null
-                });
-                renderConversation();
-            } catch (error) {
-                console.error('Error:', error);
-                history.push({ role: 'assistant', text: 'Oops, something went wrong. Try again!', tracks: [], lyrics: null, workflow: null });
-                renderConversation();
-            }
-
-            inputEl.disabled = false;
-            sendBtn.disabled = false;
-            inputEl.focus();
-        }
-
-        inputEl.addEventListener('keypress', (e) => {
-            if (e.key === 'Enter') sendMessage();
-        });
-    </script>
+    <script src="__APP_JS__"></script>
 </body>
 </html>
 """
 
 
+# Built once per process: hashed asset / media URLs and the precompressed page
+assets = AssetBundle()
+media = MediaManifest(STATIC_DIR)
+home_page = Payload(
+    HTML_TEMPLATE
+    .replace("__APP_CSS__", assets.url("app.css"))
+    .replace("__APP_JS__", assets.url("app.js"))
+    .replace("__ANIMATION_MP4__", media.url("animation.mp4"))
+    .encode(),
+    CONTENT_TYPES[".html"],
+)
+
+
 @app.get("/", response_class=HTMLResponse)
-async def get_home():
-    return HTML_TEMPLATE
+async def get_home(request: Request):
+    return home_page.response(request)
+
+
+@app.get("/assets/{name}")
+async def get_asset(name: str, request: Request):
+    """Content-hashed CSS/JS for the built-in page, cached forever by browsers"""
+    payload = assets.get(name)
+    if payload is None:
+        return Response(status_code=404)
+    return payload.response(request)
+
+
+@app.api_route("/media/{name}", methods=["GET", "HEAD"])
+async def get_media(name: str, request: Request):
+    """Content-hashed media (the header video) with Range and revalidation support"""
+    media_file = media.get(name)
+    if media_file is None:
+        return Response(status_code=404)
+    return media_file.response(request)
+
+
+@app.get("/preview/{track_id}")
+async def get_preview(track_id: int, request: Request):
+    """30-second track preview, cached on local disk (see PREVIEW_PROXY)"""
+    return await preview_response(request, track_id)
+
+
+@app.get("/cover/{album_id}")
+async def get_cover(album_id: int, request: Request, size: int = 96):
+    """Album art resized for the track cards, cached on local disk (see COVER_PROXY)"""
+    return await cover_response(request, album_id, size)
 
 
 @app.post("/collect-email")
 async def collect_email(request: Request):
     data = await request.json()
     email = data.get("email", "")
-    if email and email not in collected_emails:
-        collected_emails.append(email)
+    if get_email_store().add(email):
         print(f"New email collected: {email}")
     return JSONResponse({"status": "ok"})
 
 
 @app.get("/emails")
-async def get_emails():
-    """Admin endpoint to see collected emails"""
-    return JSONResponse({"emails": collected_emails, "count": len(collected_emails)})
+async def get_emails(
+    cursor: int = Query(0, ge=0),
+    limit: int = Query(EMAILS_PAGE_SIZE, ge=1, le=EMAILS_MAX_PAGE_SIZE),
+    format: str = "json",
+):
+    """
+    Admin endpoint to see collected emails. JSON is paged: pass the returned
+    `next_cursor` back as `cursor`. `format=ndjson` or `format=csv` streams
+    every row instead.
+    """
+    store = get_email_store()
+    if format == "ndjson":
+        rows = (json.dumps({"id": row_id, "email": email, "created_at": iso_time(created_at)}) + "\n"
+                async for row_id, email, created_at in store.iter_rows())
+        return StreamingResponse(rows, media_type="application/x-ndjson")
+    if format == "csv":
+        return StreamingResponse(
+            email_csv(store), media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="emails.csv"'},
+        )
+    if format != "json":
+        return JSONResponse({"error": "format must be json, ndjson or csv"}, status_code=400)
+
+    rows = await store.page(after=cursor, limit=limit)
+    return JSONResponse({
+        "emails": [email for _, email, _ in rows],
+        "count": store.count(),
+        "next_cursor": rows[-1][0] if len(rows) == limit else None,
+    })
+
+
+def iso_time(epoch: float) -> str:
+    """Signup time as UTC ISO 8601, the one format both exports use"""
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+async def email_csv(store):
+    """CSV export, one small buffer per row so memory stays flat"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["id", "email", "created_at"])
+    async for row_id, email, created_at in store.iter_rows():
+        writer.writerow([row_id, email, iso_time(created_at)])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+@app.get("/emails/count")
+async def get_email_count():
+    """Number of collected emails, read from the dedupe index"""
+    return JSONResponse({"count": get_email_store().count()})
+
+
+@app.get("/stats")
+async def get_stats():
+    """Admin endpoint to see connection pool and cache usage"""
+    catalog = get_catalog()
+    return JSONResponse({
+        "http_pool": get_pool().stats(),
+        "track_cache": track_cache.stats(),
+        "reply_cache": reply_cache.stats(),
+        "album_cache": album_cache.stats(),
+        "deezer_flights": deezer_flights.stats(),
+        "reply_flights": reply_flights.stats(),
+        "reply_parsing": parse_stats,
+        "sessions": sessions.stats(),
+        "state": get_state().stats(),
+        "track_catalog": catalog.stats() if catalog else None,
+        "emails": get_email_store().stats(),
+        "page_bytes": {"/": home_page.stats(), **assets.stats()},
+        "media": media.stats(),
+        "preview_cache": get_preview_cache().stats(),
+        "cover_cache": get_cover_cache().stats(),
+    })
+
+
+def _cache_stats() -> dict:
+    return {"track": track_cache.stats(), "reply": reply_cache.stats(), "album": album_cache.stats()}
+
+
+def _flight_stats() -> dict:
+    return {"deezer": deezer_flights.stats(), "reply": reply_flights.stats()}
+
+
+# Scrape-time views of numbers the caches, pool and sessions already keep
+CallbackMetric(
+    "radio_boy_cache_requests_total", "Cache lookups by result", "counter", ("cache", "result"),
+    lambda: {
+        (name, result): stats[key]
+        for name, stats in _cache_stats().items()
+        for result, key in (("hit", "hits"), ("miss", "misses"))
+    },
+)
+CallbackMetric(
+    "radio_boy_cache_hit_ratio", "Cache hit ratio since start", "gauge", ("cache",),
+    lambda: {(name,): stats["hit_ratio"] for name, stats in _cache_stats().items()},
+)
+CallbackMetric(
+    "radio_boy_cache_evictions_total", "Cache entries evicted for space", "counter", ("cache",),
+    lambda: {(name,): stats["evictions"] for name, stats in _cache_stats().items()},
+)
+CallbackMetric(
+    "radio_boy_cache_entries", "Entries held in each cache", "gauge", ("cache",),
+    lambda: {(name,): stats["entries"] for name, stats in _cache_stats().items()},
+)
+CallbackMetric(
+    "radio_boy_http_pool_in_flight", "Outbound music-API requests in flight", "gauge", (),
+    lambda: {(): get_pool().in_flight},
+)
+CallbackMetric(
+    "radio_boy_singleflight_in_flight", "Distinct upstream calls in flight", "gauge", ("call",),
+    lambda: {(name,): stats["in_flight"] for name, stats in _flight_stats().items()},
+)
+CallbackMetric(
+    "radio_boy_singleflight_coalesced_total", "Calls that joined an in-flight call",
+    "counter", ("call",),
+    lambda: {(name,): stats["followers"] for name, stats in _flight_stats().items()},
+)
+CallbackMetric(
+    "radio_boy_reply_parse_total", "Finished replies by validation outcome", "counter",
+    ("result",), lambda: {(result,): n for result, n in parse_stats.items()},
+)
+CallbackMetric(
+    "radio_boy_sessions", "Chat sessions held by the state backend", "gauge", (),
+    lambda: {(): sessions.stats()["sessions"]},
+)
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/session")
+async def create_session():
+    """A new conversation: send the returned `session_id` with each chat message"""
+    return JSONResponse({"session_id": new_session_id()})
 
 
 @app.post("/chat")
 async def chat(request: Request):
     data = await request.json()
-    user_message = data.get("message", "")
-    user_email = data.get("email", "")
+    session, user_message, messages = start_turn(data)
 
     try:
-        # Call OpenAI
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_message}
-            ],
-            temperature=0.8
-        )
-
-        content = response.choices[0].message.content.strip()
-
-        # Parse JSON response
-        try:
-            if content.startswith("```"):
-                content = content.split("```")[1]
-                if content.startswith("json"):
-                    content = content[4:]
-
-            parsed = json.loads(content)
-            message = parsed.get("message", "Let me find some tracks for you...")
-            track_requests = parsed.get("tracks", [])
-            lyrics = parsed.get("lyrics", None)
-            workflow = parsed.get("workflow", None)
-        except json.JSONDecodeError:
-            message = content
-            track_requests = []
-            lyrics = None
-            workflow = None
-
-        # Search Deezer for each track
-        tracks = []
-        for track_req in track_requests[:3]:
-            artist = track_req.get("artist", "")
-            title = track_req.get("title", "")
-            if artist and title:
-                track_data = await search_deezer(artist, title)
-                if track_data:
-                    tracks.append(track_data)
-
-        return JSONResponse({
-            "message": message,
-            "tracks": tracks,
-            "lyrics": lyrics,
-            "workflow": workflow
-        })
+        # Stream from OpenAI so Deezer lookups start as soon as each track
+        # pick is generated, then return the assembled reply in one go
+        async for event in reply_events(
+            request.app.state.llm, messages, use_cache=not data.get("no_cache", False)
+        ):
+            if event[0] == "done":
+                if session is not None:
+                    session.add_turn(user_message, event[1])
+                return json_response(request, event[1])
 
     except Exception as e:
+        record_error("chat", e)
         print(f"Error: {e}")
-        return JSONResponse({
+        return json_response(request, {
             "message": "Sorry, I hit a snag. Try again!",
             "tracks": [],
             "lyrics": None,
@@ -1217,6 +396,65 @@ async def chat(request: Request):
         })
 
 
+def sse(event: str, data) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_reply(llm: LLMClient, data: dict):
+    """
+    SSE events for one chat turn: `token` while the message is generated,
+    `lyrics` / `workflow` as soon as each block is complete, one `track` per
+    Deezer hit as it resolves (lookups start mid-generation), and a final
+    `done` with the full message and the track list that stands (a repaired
+    reply can replace tracks sent earlier).
+    """
+    session, user_message, messages = start_turn(data)
+    try:
+        async for event in reply_events(
+            llm, messages, use_cache=not data.get("no_cache", False)
+        ):
+            kind = event[0]
+            if kind == "token":
+                yield sse("token", {"text": event[1]})
+            elif kind == "track":
+                yield sse("track", {"index": event[1], "track": event[2]})
+            elif kind == "done":
+                if session is not None:
+                    session.add_turn(user_message, event[1])
+                yield sse("done", {"message": event[1]["message"], "tracks": event[1]["tracks"]})
+            else:
+                yield sse(kind, event[1])
+
+    except Exception as e:
+        record_error("chat", e)
+        print(f"Error: {e}")
+        yield sse("error", {"message": "Sorry, I hit a snag. Try again!"})
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: Request):
+    data = await request.json()
+    return StreamingResponse(
+        stream_reply(request.app.state.llm, data),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 if __name__ == "__main__":
+    # Single process by default. For several worker processes, share state
+    # between them and set the count:
+    #   STATE_BACKEND=sqlite WEB_CONCURRENCY=4 python radio_boy_app.py
+    # Workers need the app as an import string so each one can load it.
     port = int(os.getenv("PORT", 8080))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    if workers > 1:
+        if STATE_BACKEND == "memory":
+            print("Warning: STATE_BACKEND=memory gives each worker its own caches and sessions")
+        uvicorn.run(
+            "radio_boy_app:app", host="0.0.0.0", port=port, workers=workers,
+            app_dir=str(Path(__file__).resolve().parent),
+        )
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port)
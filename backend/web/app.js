@@ -0,0 +1,418 @@
+const gateway = document.getElementById('gateway');
+const emailInput = document.getElementById('emailInput');
+const emailError = document.getElementById('emailError');
+const conversationEl = document.getElementById('conversation');
+const inputEl = document.getElementById('input');
+const sendBtn = document.getElementById('send');
+const audioPlayer = document.getElementById('audioPlayer');
+const nowPlaying = document.getElementById('nowPlaying');
+const userEmailDisplay = document.getElementById('userEmailDisplay');
+
+let userEmail = localStorage.getItem('radioboy_email');
+// Server-issued session for this conversation; a new one after sign out
+let sessionId = null;
+newSession();
+let history = [];
+let currentlyPlaying = null;
+
+const playIcon = '<svg viewBox="0 0 24 24"><path d="M8 5v14l11-7z"/></svg>';
+const pauseIcon = '<svg viewBox="0 0 24 24"><rect x="6" y="4" width="4" height="16"/><rect x="14" y="4" width="4" height="16"/></svg>';
+
+// Check if user already logged in
+if (userEmail) {
+    gateway.classList.add('hidden');
+    userEmailDisplay.textContent = userEmail;
+    document.getElementById('signoutBtn').style.display = 'inline-block';
+    inputEl.focus();
+} else {
+    document.getElementById('signoutBtn').style.display = 'none';
+}
+
+async function newSession() {
+    sessionId = null;
+    try {
+        const response = await fetch('/session', { method: 'POST' });
+        sessionId = (await response.json()).session_id;
+    } catch (e) {
+        // Chat still works, just without conversation memory
+        console.error('Failed to start session:', e);
+    }
+}
+
+function validateEmail(email) {
+    const re = /^[^\s@]+@[^\s@]+\.[^\s@]+$/;
+    return re.test(email);
+}
+
+function signInWithGoogle() {
+    // For demo, prompt for email (in production, use real Google OAuth)
+    const email = prompt('Enter your Google email:');
+    if (email && validateEmail(email)) {
+        saveEmail(email);
+    }
+}
+
+function submitEmail() {
+    const email = emailInput.value.trim();
+    if (!validateEmail(email)) {
+        emailError.classList.add('show');
+        return;
+    }
+    emailError.classList.remove('show');
+    saveEmail(email);
+}
+
+async function saveEmail(email) {
+    userEmail = email;
+    localStorage.setItem('radioboy_email', email);
+
+    // Send to backend
+    try {
+        await fetch('/collect-email', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ email: email })
+        });
+    } catch (e) {
+        console.error('Failed to save email:', e);
+    }
+
+    gateway.classList.add('hidden');
+    userEmailDisplay.textContent = email;
+    document.getElementById('signoutBtn').style.display = 'inline-block';
+    inputEl.focus();
+}
+
+function signOut() {
+    // Clear localStorage
+    localStorage.removeItem('radioboy_email');
+    userEmail = null;
+
+    // Clear conversation history
+    history = [];
+    newSession();
+    renderConversation();
+
+    // Stop any playing audio
+    audioPlayer.pause();
+    currentlyPlaying = null;
+    playingCard = null;
+    nowPlaying.classList.remove('active');
+
+    // Hide user email and sign out button
+    userEmailDisplay.textContent = '';
+    document.getElementById('signoutBtn').style.display = 'none';
+
+    // Show the gateway overlay
+    gateway.classList.remove('hidden');
+}
+
+// Allow Enter key on email input
+emailInput.addEventListener('keypress', (e) => {
+    if (e.key === 'Enter') submitEmail();
+});
+
+const micIcon = '<svg viewBox="0 0 24 24"><path d="M12 14c1.66 0 3-1.34 3-3V5c0-1.66-1.34-3-3-3S9 3.34 9 5v6c0 1.66 1.34 3 3 3z"/><path d="M17 11c0 2.76-2.24 5-5 5s-5-2.24-5-5H5c0 3.53 2.61 6.43 6 6.92V21h2v-3.08c3.39-.49 6-3.39 6-6.92h-2z"/></svg>';
+const checklistIcon = '<svg viewBox="0 0 24 24"><path d="M19 3H5c-1.1 0-2 .9-2 2v14c0 1.1.9 2 2 2h14c1.1 0 2-.9 2-2V5c0-1.1-.9-2-2-2zm-9 14l-5-5 1.41-1.41L10 14.17l7.59-7.59L19 8l-9 9z"/></svg>';
+
+// Only the newest messages are kept in the DOM; older ones are re-attached
+// a page at a time from the "earlier messages" bar
+const MAX_RENDERED = 300;
+const EARLIER_PAGE = 100;
+// Index into history of the oldest message currently in the DOM
+let renderedFrom = 0;
+let earlierBar = null;
+
+function messageHtml(msg) {
+    let tracksHtml = '';
+    let lyricsHtml = '';
+    let workflowHtml = '';
+
+    // Render tracks
+    if (msg.tracks && msg.tracks.length > 0) {
+        tracksHtml = '<div class="tracks">' + msg.tracks.map((track, trackIdx) => {
+            const safeTitle = track.title.replace(/'/g, "&#39;");
+            const safeArtist = track.artist.replace(/'/g, "&#39;");
+            return '<div class="track-card" data-preview="' + track.preview + '" data-title="' + safeTitle + '" data-artist="' + safeArtist + '" data-cover="' + track.cover + '" onclick="playTrack(this)">' +
+                '<img class="track-cover" src="' + track.cover + '" alt="" loading="lazy">' +
+                '<div class="track-info">' +
+                    '<div class="track-title">' + track.title + '</div>' +
+                    '<div class="track-artist">' + track.artist + '</div>' +
+                '</div>' +
+                '<button class="play-btn">' + playIcon + '</button>' +
+            '</div>';
+        }).join('') + '</div>';
+    }
+
+    // Render lyrics
+    if (msg.lyrics) {
+        let lyricsParts = '';
+        if (msg.lyrics.hook) {
+            lyricsParts += '<div class="lyrics-part"><div class="lyrics-label">Hook</div><div class="lyrics-content lyrics-hook">' + msg.lyrics.hook + '</div></div>';
+        }
+        if (msg.lyrics.verse) {
+            lyricsParts += '<div class="lyrics-part"><div class="lyrics-label">Verse</div><div class="lyrics-content">' + msg.lyrics.verse.replace(/\n/g, '<br>') + '</div></div>';
+        }
+        if (msg.lyrics.structure) {
+            lyricsParts += '<div class="lyrics-part"><div class="lyrics-label">Structure</div><div class="lyrics-content">' + msg.lyrics.structure + '</div></div>';
+        }
+        if (msg.lyrics.adlibs && msg.lyrics.adlibs.length > 0) {
+            lyricsParts += '<div class="lyrics-part"><div class="lyrics-label">Ad-libs</div><div class="adlibs">' +
+                msg.lyrics.adlibs.map(a => '<span class="adlib-tag">' + a + '</span>').join('') + '</div></div>';
+        }
+        if (lyricsParts) {
+            lyricsHtml = '<div class="lyrics-section"><div class="lyrics-header">' + micIcon + ' Songwriting</div>' + lyricsParts + '</div>';
+        }
+    }
+
+    // Render workflow
+    if (msg.workflow && msg.workflow.items && msg.workflow.items.length > 0) {
+        const isChecklist = msg.workflow.type === 'todo' || msg.workflow.type === 'checklist';
+        const itemsHtml = msg.workflow.items.map((item, i) => {
+            const indicator = isChecklist ?
+                '<div class="workflow-checkbox"></div>' :
+                '<div class="workflow-number">' + (i + 1) + '</div>';
+            return '<div class="workflow-item">' + indicator + '<span>' + item + '</span></div>';
+        }).join('');
+        workflowHtml = '<div class="workflow-section"><div class="workflow-header">' + checklistIcon + ' ' + (msg.workflow.type || 'Workflow') + '</div>' +
+            '<div class="workflow-title">' + (msg.workflow.title || '') + '</div>' +
+            '<div class="workflow-items">' + itemsHtml + '</div></div>';
+    }
+
+    return '<span class="speaker">' + (msg.role === 'user' ? 'You' : 'Radio Boy') + ':</span>' +
+        (msg.pending && !msg.text ? '<span class="loading"></span>' : '<span class="text"> ' + msg.text + '</span>') +
+        tracksHtml + lyricsHtml + workflowHtml;
+}
+
+function buildMessageEl(msg) {
+    const el = document.createElement('div');
+    el.className = 'message ' + msg.role;
+    el.innerHTML = messageHtml(msg);
+    msg.el = el;
+    restorePlayingCard(msg);
+    return el;
+}
+
+// Re-render one message in place, e.g. while its reply streams in
+function updateMessage(msg) {
+    if (!msg.el) return;
+    msg.el.innerHTML = messageHtml(msg);
+    restorePlayingCard(msg);
+}
+
+// A re-rendered message gets fresh card nodes; keep the playing one marked
+function restorePlayingCard(msg) {
+    if (!currentlyPlaying || !msg.tracks || msg.tracks.length === 0) return;
+    if (playingCard && playingCard.isConnected) return;
+    const card = Array.from(msg.el.querySelectorAll('.track-card'))
+        .find(el => el.dataset.preview === currentlyPlaying);
+    if (card) setCardPlaying(card, true);
+}
+
+function appendMessage(msg) {
+    const empty = conversationEl.querySelector('.empty-state');
+    if (empty) empty.remove();
+    conversationEl.appendChild(buildMessageEl(msg));
+    trimRendered();
+    conversationEl.scrollTop = conversationEl.scrollHeight;
+}
+
+// Detach the oldest message nodes once the DOM holds more than MAX_RENDERED
+function trimRendered() {
+    const excess = history.length - renderedFrom - MAX_RENDERED;
+    if (excess <= 0) return;
+    for (let i = renderedFrom; i < renderedFrom + excess; i++) {
+        if (history[i].el) history[i].el.remove();
+        history[i].el = null;
+    }
+    renderedFrom += excess;
+    updateEarlierBar();
+}
+
+function showEarlier() {
+    const start = Math.max(0, renderedFrom - EARLIER_PAGE);
+    const fragment = document.createDocumentFragment();
+    for (let i = start; i < renderedFrom; i++) {
+        fragment.appendChild(buildMessageEl(history[i]));
+    }
+    // Keep the messages the user is looking at in place
+    const previousHeight = conversationEl.scrollHeight;
+    conversationEl.insertBefore(fragment, earlierBar ? earlierBar.nextSibling : conversationEl.firstChild);
+    conversationEl.scrollTop += conversationEl.scrollHeight - previousHeight;
+    renderedFrom = start;
+    updateEarlierBar();
+}
+
+function updateEarlierBar() {
+    if (renderedFrom === 0) {
+        if (earlierBar) earlierBar.remove();
+        earlierBar = null;
+        return;
+    }
+    if (!earlierBar) {
+        earlierBar = document.createElement('button');
+        earlierBar.className = 'earlier-messages';
+        earlierBar.onclick = showEarlier;
+        conversationEl.insertBefore(earlierBar, conversationEl.firstChild);
+    }
+    earlierBar.textContent = 'Show ' + Math.min(EARLIER_PAGE, renderedFrom) + ' earlier messages (' + renderedFrom + ' hidden)';
+}
+
+// Full rebuild; only for a reset such as signing out
+function renderConversation() {
+    renderedFrom = Math.max(0, history.length - MAX_RENDERED);
+    earlierBar = null;
+    if (history.length === 0) {
+        conversationEl.innerHTML = '<div class="empty-state">Tell me your vibe, share song ideas, or ask me to help manage your creative workflow.</div>';
+        return;
+    }
+    conversationEl.innerHTML = '';
+    const fragment = document.createDocumentFragment();
+    for (let i = renderedFrom; i < history.length; i++) {
+        fragment.appendChild(buildMessageEl(history[i]));
+    }
+    conversationEl.appendChild(fragment);
+    updateEarlierBar();
+    conversationEl.scrollTop = conversationEl.scrollHeight;
+}
+
+// The card showing the pause button, so switching tracks touches two nodes
+let playingCard = null;
+
+function setCardPlaying(card, playing) {
+    card.classList.toggle('playing', playing);
+    card.querySelector('.play-btn').innerHTML = playing ? pauseIcon : playIcon;
+    if (playing) playingCard = card;
+}
+
+function clearPlayingCard() {
+    if (playingCard) setCardPlaying(playingCard, false);
+    playingCard = null;
+}
+
+function playTrack(element) {
+    const preview = element.dataset.preview;
+    const title = element.dataset.title;
+    const artist = element.dataset.artist;
+    const cover = element.dataset.cover;
+
+    clearPlayingCard();
+
+    if (currentlyPlaying === preview && !audioPlayer.paused) {
+        audioPlayer.pause();
+        currentlyPlaying = null;
+        nowPlaying.classList.remove('active');
+    } else {
+        audioPlayer.src = preview;
+        audioPlayer.play();
+        currentlyPlaying = preview;
+        setCardPlaying(element, true);
+
+        document.getElementById('npCover').src = cover;
+        document.getElementById('npTitle').textContent = title;
+        document.getElementById('npArtist').textContent = artist;
+        nowPlaying.classList.add('active');
+    }
+}
+
+audioPlayer.addEventListener('ended', () => {
+    clearPlayingCard();
+    currentlyPlaying = null;
+    nowPlaying.classList.remove('active');
+});
+
+// Batch re-renders of the streaming message to one per animation frame
+const pendingUpdates = new Set();
+let renderQueued = false;
+function scheduleUpdate(msg) {
+    pendingUpdates.add(msg);
+    if (renderQueued) return;
+    renderQueued = true;
+    requestAnimationFrame(() => {
+        renderQueued = false;
+        const atBottom = conversationEl.scrollHeight - conversationEl.scrollTop - conversationEl.clientHeight < 40;
+        pendingUpdates.forEach(updateMessage);
+        pendingUpdates.clear();
+        if (atBottom) conversationEl.scrollTop = conversationEl.scrollHeight;
+    });
+}
+
+function handleStreamEvent(msg, event, data) {
+    if (event === 'token') {
+        msg.text += data.text;
+    } else if (event === 'track') {
+        msg.trackSlots[data.index] = data.track;
+        msg.tracks = msg.trackSlots.filter(Boolean);
+    } else if (event === 'lyrics') {
+        msg.lyrics = data;
+    } else if (event === 'workflow') {
+        msg.workflow = data;
+    } else if (event === 'done' || event === 'error') {
+        msg.text = data.message;
+        // The final list wins over tracks streamed from a reply that was repaired
+        if (data.tracks) msg.tracks = data.tracks;
+        msg.pending = false;
+    }
+    scheduleUpdate(msg);
+}
+
+async function sendMessage() {
+    const text = inputEl.value.trim();
+    if (!text) return;
+
+    inputEl.disabled = true;
+    sendBtn.disabled = true;
+
+    const userMsg = { role: 'user', text: text, tracks: [] };
+    history.push(userMsg);
+    appendMessage(userMsg);
+    const msg = { role: 'assistant', text: '', tracks: [], trackSlots: [], lyrics: null, workflow: null, pending: true };
+    history.push(msg);
+    appendMessage(msg);
+    inputEl.value = '';
+
+    try {
+        const response = await fetch('/chat/stream', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ message: text, session_id: sessionId })
+        });
+        if (!response.ok || !response.body) throw new Error('HTTP ' + response.status);
+
+        // Parse the Server-Sent Events stream by hand (EventSource can't POST)
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let sep;
+            while ((sep = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, sep);
+                buffer = buffer.slice(sep + 2);
+                let event = 'message';
+                let data = '';
+                block.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) event = line.slice(6).trim();
+                    else if (line.startsWith('data:')) data += line.slice(5).trim();
+                });
+                if (data) handleStreamEvent(msg, event, JSON.parse(data));
+            }
+        }
+        if (msg.pending) throw new Error('Stream ended early');
+    } catch (error) {
+        console.error('Error:', error);
+        msg.text = 'Oops, something went wrong. Try again!';
+        msg.pending = false;
+        updateMessage(msg);
+    }
+
+    inputEl.disabled = false;
+    sendBtn.disabled = false;
+    inputEl.focus();
+}
+
+inputEl.addEventListener('keypress', (e) => {
+    if (e.key === 'Enter') sendMessage();
+});